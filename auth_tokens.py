@@ -0,0 +1,175 @@
+"""
+Supabase access-token verification with a short-lived cache.
+
+Tokens are checked locally against the project's JWT secret (HS256) or its JWKS
+(asymmetric signing keys) so dashboard requests skip the auth-server round-trip.
+`supabase.auth.get_user` is only called when local verification is unavailable or
+inconclusive.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+LOCAL_ALGORITHMS = {"HS256", "RS256", "ES256"}
+TOKEN_AUDIENCE = "authenticated"
+
+
+class TokenRejected(Exception):
+    pass
+
+
+@dataclass
+class VerifiedUser:
+    id: str
+    email: Optional[str] = None
+    claims: Dict[str, Any] = field(default_factory=dict)
+
+
+def _load_jwt():
+    # PyJWT (pulled in by supabase) costs ~100 ms to import, so defer it to the first request
+    try:
+        import jwt  # type: ignore
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return jwt
+
+
+def _percentile(samples, pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[int(pct * (len(ordered) - 1))], 2)
+
+
+class TokenVerifier:
+    def __init__(
+        self,
+        remote_lookup: Callable[[str], Any],
+        *,
+        jwt_secret: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        ttl_s: float = 60.0,
+        max_entries: int = 1024,
+    ):
+        self.remote_lookup = remote_lookup
+        self.jwt_secret = jwt_secret
+        self.jwks_url = jwks_url
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._jwks_client = None
+        self._cache: "OrderedDict[str, Tuple[VerifiedUser, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "local_verified": 0, "remote_verified": 0, "rejected": 0}
+        self._latency_ms: Dict[str, deque] = {"local": deque(maxlen=500), "remote": deque(maxlen=500)}
+
+    @classmethod
+    def from_env(cls, remote_lookup: Callable[[str], Any]) -> "TokenVerifier":
+        supabase_url = (os.getenv("SUPABASE_URL") or "").rstrip("/")
+        return cls(
+            remote_lookup,
+            jwt_secret=os.getenv("SUPABASE_JWT_SECRET") or None,
+            jwks_url=f"{supabase_url}/auth/v1/.well-known/jwks.json" if supabase_url else None,
+            ttl_s=float(os.getenv("AUTH_CACHE_TTL_S", "60")),
+        )
+
+    def _cache_get(self, key: str) -> Optional[VerifiedUser]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return user
+
+    def _cache_put(self, key: str, user: VerifiedUser) -> None:
+        expires_at = time.time() + self.ttl_s
+        token_exp = user.claims.get("exp")
+        if isinstance(token_exp, (int, float)):
+            # never serve a token past its own expiry
+            expires_at = min(expires_at, float(token_exp))
+        with self._lock:
+            self._cache[key] = (user, expires_at)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _signing_key(self, jwt, token: str, alg: str):
+        if alg == "HS256":
+            return self.jwt_secret
+        if not self.jwks_url:
+            return None
+        if self._jwks_client is None:
+            self._jwks_client = jwt.PyJWKClient(self.jwks_url, cache_keys=True, lifespan=3600)
+        return self._jwks_client.get_signing_key_from_jwt(token).key
+
+    def _verify_local(self, token: str) -> Optional[VerifiedUser]:
+        """The verified user, or None when the token can't be checked locally."""
+        jwt = _load_jwt()
+        if jwt is None:
+            return None
+        try:
+            alg = jwt.get_unverified_header(token).get("alg")
+            if alg not in LOCAL_ALGORITHMS:
+                return None
+            key = self._signing_key(jwt, token, alg)
+            if key is None:
+                return None
+            claims = jwt.decode(token, key, algorithms=[alg], audience=TOKEN_AUDIENCE)
+        except jwt.ExpiredSignatureError as exc:
+            raise TokenRejected("token expired") from exc
+        except Exception as exc:
+            # wrong/rotated key, JWKS unreachable, ...: let the auth server decide
+            print(f"⚠️  Local token verification inconclusive ({type(exc).__name__}); asking Supabase.")
+            return None
+        if not claims.get("sub"):
+            raise TokenRejected("token has no subject")
+        return VerifiedUser(id=claims["sub"], email=claims.get("email"), claims=claims)
+
+    def _verify_remote(self, token: str) -> VerifiedUser:
+        try:
+            user_resp = self.remote_lookup(token)
+        except Exception as exc:
+            raise TokenRejected(str(exc)) from exc
+        user = getattr(user_resp, "user", None)
+        if not user:
+            raise TokenRejected("invalid token")
+        return VerifiedUser(id=user.id, email=getattr(user, "email", None))
+
+    def verify(self, token: str) -> VerifiedUser:
+        key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        user = self._cache_get(key)
+        if user is not None:
+            self.stats["cache_hits"] += 1
+            return user
+        try:
+            started = time.perf_counter()
+            user = self._verify_local(token)
+            if user is not None:
+                self._latency_ms["local"].append((time.perf_counter() - started) * 1000)
+                self.stats["local_verified"] += 1
+            else:
+                started = time.perf_counter()
+                user = self._verify_remote(token)
+                self._latency_ms["remote"].append((time.perf_counter() - started) * 1000)
+                self.stats["remote_verified"] += 1
+        except TokenRejected:
+            self.stats["rejected"] += 1
+            raise
+        self._cache_put(key, user)
+        return user
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self.stats)
+        lookups = out["cache_hits"] + out["local_verified"] + out["remote_verified"]
+        out["cache_hit_ratio"] = round(out["cache_hits"] / lookups, 3) if lookups else 0.0
+        for path, samples in self._latency_ms.items():
+            out[f"{path}_p50_ms"] = _percentile(samples, 0.5)
+            out[f"{path}_p95_ms"] = _percentile(samples, 0.95)
+        return out
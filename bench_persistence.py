@@ -0,0 +1,102 @@
+"""
+Round-trip and latency check for `persistence.save_case_report`.
+
+Point SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY at a local stack (`supabase start`
+runs Postgres + PostgREST in Docker) and pass an existing auth user id:
+
+    python bench_persistence.py --user-id <uuid> --runs 20
+
+Each run saves a synthetic six-dimension report twice (first save, then the
+refresh re-save). Round-trips to `cases`/`case_rubrics` (the save) are counted
+apart from the aggregate updates. Afterwards the cases are deleted, the user's
+`user_progress` row is restored, and the bench's own `score_sketches` keys (under a
+one-off case type) are removed.
+"""
+import argparse
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from persistence import save_case_report
+from rubrics import DIMENSION_ORDER
+from supabase_client import get_supabase
+
+
+SAVE_TABLES = {"cases", "case_rubrics"}
+
+
+def synthetic_report(title: str, case_type: str) -> Dict[str, Any]:
+    return {
+        "case": {
+            "title": title,
+            "type": case_type,
+            "industry": "Retail",
+            "completedAt": datetime.now(timezone.utc).isoformat(),
+            "durationSec": 1500,
+        },
+        "overall": {"band": "Solid", "executiveSummary": "Benchmark report."},
+        "rubrics": [
+            {"key": key, "title": key, "score": 3 + (i % 3), "strengths": [], "improvements": []}
+            for i, key in enumerate(DIMENSION_ORDER)
+        ],
+    }
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[int(pct * (len(ordered) - 1))]
+
+
+def run(user_id: str, runs: int) -> None:
+    supabase = get_supabase()
+    if supabase is None:
+        raise SystemExit("Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY first.")
+    requests_sent = {"save": 0, "aggregates": 0}
+
+    def count_request(req) -> None:
+        table = req.url.path.rstrip("/").rsplit("/", 1)[-1]
+        requests_sent["save" if table in SAVE_TABLES else "aggregates"] += 1
+
+    supabase.postgrest.session.event_hooks["request"].append(count_request)
+
+    case_type = f"bench-{uuid.uuid4().hex[:8]}"  # keeps the bench's samples out of real cohorts
+    saved_progress = supabase.table("user_progress").select("*").eq("user_id", user_id).limit(1).execute().data
+    timings: Dict[str, List[float]] = {"first save": [], "re-save": []}
+    round_trips: Dict[str, List[Dict[str, int]]] = {"first save": [], "re-save": []}
+    case_ids = []
+    try:
+        for _ in range(runs):
+            report = synthetic_report(f"bench-{uuid.uuid4().hex[:8]}", case_type)
+            for label in ("first save", "re-save"):
+                before = dict(requests_sent)
+                started = time.perf_counter()
+                case_ids.append(save_case_report(user_id, report))
+                timings[label].append((time.perf_counter() - started) * 1000)
+                round_trips[label].append({k: requests_sent[k] - before[k] for k in requests_sent})
+    finally:
+        for case_id in set(case_ids):
+            supabase.table("case_rubrics").delete().eq("case_id", case_id).execute()
+            supabase.table("cases").delete().eq("id", case_id).execute()
+        if saved_progress:
+            supabase.table("user_progress").upsert(saved_progress[0], on_conflict="user_id", returning="minimal").execute()
+        else:
+            supabase.table("user_progress").delete().eq("user_id", user_id).execute()
+        supabase.table("score_sketches").delete().like("key", f"%|{case_type}|%").execute()
+
+    for label, samples in timings.items():
+        save_trips = max(t["save"] for t in round_trips[label])
+        aggregate_trips = max(t["aggregates"] for t in round_trips[label])
+        print(
+            f"{label:>10}: {save_trips} save + {aggregate_trips} aggregate round-trips, "
+            f"p50 {statistics.median(samples):.1f} ms, p95 {_percentile(samples, 0.95):.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark save_case_report round-trips")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    run(args.user_id, args.runs)
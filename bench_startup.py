@@ -0,0 +1,68 @@
+"""
+Cold-start import report for the two entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter per entry
+point and prints the total import time plus the slowest top-level imports.
+
+    python bench_startup.py            # web_server and main
+    python bench_startup.py web_server --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ENTRY_POINTS = ["web_server", "main"]
+
+
+def import_times(module: str) -> Tuple[int, List[Tuple[int, str]]]:
+    """Returns (cumulative µs for the module, [(cumulative µs, name)] for its direct imports)."""
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "startup-bench")  # nothing is called; avoids SDK complaints
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    total = 0
+    children: List[Tuple[int, str]] = []
+    pending: List[Tuple[int, str]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        # importtime prints children before parents, indented two spaces per level
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        name = raw_name.strip()
+        if depth == 1:
+            pending.append((int(cumulative), name))
+        elif depth == 0:
+            if name == module:
+                total = int(cumulative)
+                children = pending
+            pending = []
+    return total, sorted(children, reverse=True)
+
+
+def report(modules: List[str], top: int) -> Dict[str, int]:
+    totals = {}
+    for module in modules:
+        total, entries = import_times(module)
+        totals[module] = total
+        print(f"\n{module}: {total / 1000:.1f} ms cold import")
+        for us, name in entries[:top]:
+            print(f"  {us / 1000:8.1f} ms  {name}")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    report(args.modules, args.top)
@@ -1,8 +1,10 @@
 import json
+import os
 from typing import Dict, Any, Optional
 from schemas import GeneratedCase
 
 CONSULTING_CASE_TYPES = ["M&A", "Market Entry", "Profitability", "Market Share"]
+CASE_GEN_TIMEOUT_S = float(os.getenv("LLM_CASE_GEN_TIMEOUT_S", "120"))
 
 CASE_GEN_SYSTEM = """You generate McKinsey-style case interview content.
 Return ONLY valid JSON matching the schema for GeneratedCase:
@@ -89,7 +91,7 @@ def generate_case(llm, case_theme: Optional[str] = None, difficulty: str = "medi
 
     last_error = None
     for attempt in range(1, 4):
-        text = llm.run_text(CASE_GEN_SYSTEM, user_payload)  # returns JSON text
+        text = llm.run_text(CASE_GEN_SYSTEM, user_payload, timeout=CASE_GEN_TIMEOUT_S)  # returns JSON text
         try:
             data = json.loads(text)
             case = GeneratedCase.model_validate(data)  # validate shape
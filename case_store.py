@@ -1,23 +1,216 @@
-from typing import Dict, Any
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+SPILL_MAX_AGE_S = 24 * 3600
+
+
+def _freeze(value: Any) -> Any:
+    """Read-only copy: mappings become MappingProxyType, lists and tuples become tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Plain dict/list copy of a frozen value, for code that needs JSON or pydantic input."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+class StageContext(Mapping):
+    """
+    Read-only {case_id, background, stage} view built once per case. The values are a
+    frozen copy (nested mappings are read-only proxies, lists are tuples), so later
+    changes to the case dict can't reach it and `json_fragment`, serialized from the
+    same snapshot, can't go stale. LLM payloads splice the fragment in without
+    re-encoding the background text every turn.
+    """
+
+    __slots__ = ("_data", "json_fragment")
+
+    def __init__(self, case_id: str, background: Any, stage: Dict[str, Any]):
+        data = {"case_id": case_id, "background": background, "stage": stage}
+        self.json_fragment = json.dumps(data)
+        self._data = _freeze(data)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def build_stage_contexts(case_id: str, case_obj: Dict[str, Any]) -> Dict[str, StageContext]:
+    background = case_obj.get("background")
+    return {
+        stage_id: StageContext(case_id, background, stage)
+        for stage_id, stage in (case_obj.get("stages") or {}).items()
+    }
+
 
 class CaseStore:
-    def __init__(self):
-        self._cases: Dict[str, Dict[str, Any]] = {}
+    """
+    LRU cache of generated cases, bounded by count, approximate JSON size and idle TTL.
+
+    Evicted cases are written to gzip'd JSON files under `spill_dir` (when set) and
+    reloaded transparently on the next `load_case`/`get_stage_context`.
+    """
+
+    def __init__(
+        self,
+        max_cases: int = 64,
+        max_bytes: Optional[int] = 64 * 1024 * 1024,
+        ttl_s: Optional[float] = None,
+        spill_dir: Optional[str] = None,
+    ):
+        self.max_cases = max_cases
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        # case_id -> (case, stage contexts, approx bytes, last access)
+        self._cases: "OrderedDict[str, Tuple[Dict[str, Any], Dict[str, StageContext], int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "spill_loads": 0, "evictions": 0, "spilled": 0}
+
+    @classmethod
+    def from_env(cls) -> "CaseStore":
+        ttl = os.getenv("CASE_STORE_TTL_S")
+        spill_dir = os.getenv("CASE_STORE_SPILL_DIR")
+        if spill_dir is None:
+            spill_dir = os.path.join(tempfile.gettempdir(), "case_store_spill")
+        return cls(
+            max_cases=int(os.getenv("CASE_STORE_MAX_CASES", "64")),
+            max_bytes=int(float(os.getenv("CASE_STORE_MAX_MB", "64")) * 1024 * 1024),
+            ttl_s=float(ttl) if ttl else None,
+            spill_dir=spill_dir or None,  # CASE_STORE_SPILL_DIR="" disables spilling
+        )
+
+    def _spill_path(self, case_id: str) -> str:
+        name = hashlib.sha1(case_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.json.gz")
+
+    def _spill(self, case_id: str, case_obj: Dict[str, Any]) -> None:
+        if not self.spill_dir:
+            return
+        try:
+            path = self._spill_path(case_id)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+                json.dump({"case_id": case_id, "case": case_obj}, fh)
+            os.replace(tmp_path, path)
+            self.stats["spilled"] += 1
+        except OSError as exc:
+            print(f"⚠️  Could not spill case '{case_id}' to disk: {exc}")
+
+    def _load_spilled(self, case_id: str) -> Optional[Dict[str, Any]]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(case_id)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                record = json.load(fh)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            print(f"⚠️  Discarding unreadable spilled case '{case_id}': {exc}")
+            record = None
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        if not record or record.get("case_id") != case_id:
+            return None
+        return record["case"]
+
+    def _prune_spill_dir(self) -> None:
+        cutoff = time.time() - SPILL_MAX_AGE_S
+        try:
+            with os.scandir(self.spill_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json.gz") and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError:
+            pass
+
+    def _evict_one(self) -> None:
+        case_id, (case_obj, _, size, _) = self._cases.popitem(last=False)
+        self._bytes -= size
+        self.stats["evictions"] += 1
+        self._spill(case_id, case_obj)
+
+    def _enforce_limits(self) -> None:
+        if self.ttl_s is not None:
+            cutoff = time.monotonic() - self.ttl_s
+            # OrderedDict is in access order, so idle entries sit at the front
+            while self._cases and next(iter(self._cases.values()))[3] < cutoff:
+                self._evict_one()
+        while len(self._cases) > self.max_cases:
+            self._evict_one()
+        while self.max_bytes is not None and self._bytes > self.max_bytes and len(self._cases) > 1:
+            self._evict_one()
+        if self.stats["evictions"] and self.spill_dir and self.stats["evictions"] % 50 == 0:
+            self._prune_spill_dir()
+
+    def _insert(self, case_id: str, case_obj: Dict[str, Any]) -> Dict[str, StageContext]:
+        contexts = build_stage_contexts(case_id, case_obj)
+        size = len(json.dumps(case_obj, separators=(",", ":"), default=str))
+        previous = self._cases.pop(case_id, None)
+        if previous is not None:
+            self._bytes -= previous[2]
+        self._cases[case_id] = (case_obj, contexts, size, time.monotonic())
+        self._bytes += size
+        self._enforce_limits()
+        return contexts
 
     def put_case(self, case_id: str, case_obj: Dict[str, Any]) -> None:
-        self._cases[case_id] = case_obj
+        with self._lock:
+            self._insert(case_id, case_obj)
+
+    def _get(self, case_id: str) -> Tuple[Dict[str, Any], Dict[str, StageContext]]:
+        with self._lock:
+            entry = self._cases.get(case_id)
+            if entry is not None:
+                case_obj, contexts, size, _ = entry
+                self._cases[case_id] = (case_obj, contexts, size, time.monotonic())
+                self._cases.move_to_end(case_id)
+                self.stats["hits"] += 1
+                return case_obj, contexts
+            case_obj = self._load_spilled(case_id)
+            if case_obj is None:
+                self.stats["misses"] += 1
+                raise KeyError(f"Case '{case_id}' not found.")
+            self.stats["spill_loads"] += 1
+            return case_obj, self._insert(case_id, case_obj)
 
     def load_case(self, case_id: str) -> Dict[str, Any]:
-        if case_id not in self._cases:
-            raise KeyError(f"Case '{case_id}' not found.")
-        return self._cases[case_id]
+        return self._get(case_id)[0]
 
-    def get_stage_context(self, case_id: str, stage_id: str) -> Dict[str, Any]:
-        case = self.load_case(case_id)
-        if stage_id not in case["stages"]:
+    def get_stage_context(self, case_id: str, stage_id: str) -> StageContext:
+        _, contexts = self._get(case_id)
+        if stage_id not in contexts:
             raise KeyError(f"Stage '{stage_id}' not found in case '{case_id}'")
-        return {
-            "case_id": case_id,
-            "background": case["background"],
-            "stage": case["stages"][stage_id],
-        }
\ No newline at end of file
+        return contexts[stage_id]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "cases": len(self._cases), "bytes": self._bytes}
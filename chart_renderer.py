@@ -1,70 +1,177 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 
-import matplotlib.pyplot as plt
+IMAGE_MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def _as_dict(chart_spec: Any) -> Dict[str, Any]:
+    return chart_spec if isinstance(chart_spec, dict) else chart_spec.model_dump()
+
+
+def chart_spec_hash(chart_spec: Any) -> str:
+    canonical = json.dumps(_as_dict(chart_spec), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:20]
+
+
+def draw_chart(ax, spec: Dict[str, Any]) -> None:
+    chart_type = (spec.get("type") or "").lower()
+    title = spec.get("title", "Chart")
+    x_label = spec.get("x_label")
+    y_label = spec.get("y_label")
+    data = spec.get("data")
+
+    if chart_type == "bar":
+        labels = list(data.keys())
+        values = list(data.values())
+        ax.bar(labels, values, color="#4f81bd")
+    elif chart_type == "line":
+        if isinstance(data, dict):
+            labels = list(data.keys())
+            values = list(data.values())
+        else:
+            labels = [item.get("x") for item in data]
+            values = [item.get("y") for item in data]
+        ax.plot(labels, values, marker="o", color="#c0504d")
+    elif chart_type == "scatter":
+        xs = [item.get("x") for item in data]
+        ys = [item.get("y") for item in data]
+        ax.scatter(xs, ys, color="#9bbb59")
+    elif chart_type == "table":
+        ax.axis("off")
+        headers = list(data[0].keys())
+        rows = [[row.get(h, "") for h in headers] for row in data]
+        table = ax.table(cellText=rows, colLabels=headers, loc="center")
+        table.scale(1, 2)
+    else:
+        ax.text(0.5, 0.5, "Unsupported chart type", ha="center", va="center")
+
+    ax.set_title(title)
+    if x_label:
+        ax.set_xlabel(x_label)
+    if y_label:
+        ax.set_ylabel(y_label)
 
 
 class ChartRenderer:
+    """Interactive desktop renderer used by the CLI."""
+
     def __init__(self):
         self.figure = None
+        self.spec_hash: Optional[str] = None
 
     def render(self, chart_spec: Dict[str, Any]) -> None:
         if not chart_spec:
             return
         spec = chart_spec
-        chart_type = (spec.get("type") or "").lower()
-        title = spec.get("title", "Chart")
-        x_label = spec.get("x_label")
-        y_label = spec.get("y_label")
-        data = spec.get("data")
-
-        if not data:
+        if not spec.get("data"):
             return
 
+        import matplotlib.pyplot as plt
+
+        spec_hash = chart_spec_hash(spec)
+        if self.figure is not None and spec_hash == self.spec_hash and plt.fignum_exists(self.figure.number):
+            # already on screen
+            return
         if self.figure:
             plt.close(self.figure)
         self.figure = plt.figure(figsize=(7, 4.5))
+        self.spec_hash = spec_hash
         ax = self.figure.add_subplot(111)
-
-        if chart_type == "bar":
-            labels = list(data.keys())
-            values = list(data.values())
-            ax.bar(labels, values, color="#4f81bd")
-        elif chart_type == "line":
-            if isinstance(data, dict):
-                labels = list(data.keys())
-                values = list(data.values())
-            else:
-                labels = [item.get("x") for item in data]
-                values = [item.get("y") for item in data]
-            ax.plot(labels, values, marker="o", color="#c0504d")
-        elif chart_type == "scatter":
-            xs = [item.get("x") for item in data]
-            ys = [item.get("y") for item in data]
-            ax.scatter(xs, ys, color="#9bbb59")
-        elif chart_type == "table":
-            ax.axis("off")
-            headers = list(data[0].keys())
-            rows = [[row.get(h, "") for h in headers] for row in data]
-            table = ax.table(cellText=rows, colLabels=headers, loc="center")
-            table.scale(1, 2)
-        else:
-            ax.text(0.5, 0.5, "Unsupported chart type", ha="center", va="center")
-
-        ax.set_title(title)
-        if x_label:
-            ax.set_xlabel(x_label)
-        if y_label:
-            ax.set_ylabel(y_label)
+        draw_chart(ax, spec)
         self.figure.tight_layout()
         plt.show(block=False)
 
 
+class HeadlessChartRenderer:
+    """
+    Renders a ChartSpec to PNG/SVG bytes with the Agg canvas (no display, no pyplot
+    global state). Registered specs and rendered images are kept in bounded LRUs keyed
+    by spec hash; an evicted spec's URL returns 404 until the chart is registered again.
+    """
+
+    def __init__(self, max_images: int = 256, dpi: int = 120, max_specs: Optional[int] = None):
+        self.max_images = max_images
+        self.max_specs = max_specs or max_images
+        self.dpi = dpi
+        self._specs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._images: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, chart_spec: Any) -> str:
+        spec = _as_dict(chart_spec)
+        spec_hash = chart_spec_hash(spec)
+        with self._lock:
+            self._specs[spec_hash] = spec
+            self._specs.move_to_end(spec_hash)
+            while len(self._specs) > self.max_specs:
+                evicted, _ = self._specs.popitem(last=False)
+                for fmt in IMAGE_MIME_TYPES:
+                    self._images.pop((evicted, fmt), None)
+        return spec_hash
+
+    def _draw(self, spec: Dict[str, Any], fmt: str) -> bytes:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        figure = Figure(figsize=(7, 4.5))
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot(111)
+        draw_chart(ax, spec)
+        figure.tight_layout()
+        buf = io.BytesIO()
+        figure.savefig(buf, format=fmt, dpi=self.dpi)
+        return buf.getvalue()
+
+    def render(self, chart_spec: Any, fmt: str = "png") -> Tuple[str, bytes]:
+        spec_hash = self.register(chart_spec)
+        return spec_hash, self.get(spec_hash, fmt)
+
+    def get(self, spec_hash: str, fmt: str = "png") -> Optional[bytes]:
+        """Cached image bytes for a registered spec, rendering on first request."""
+        if fmt not in IMAGE_MIME_TYPES:
+            raise ValueError(f"Unsupported chart format '{fmt}'.")
+        key = (spec_hash, fmt)
+        with self._lock:
+            spec = self._specs.get(spec_hash)
+            if spec is None:
+                return None
+            self._specs.move_to_end(spec_hash)
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+        image = self._draw(spec, fmt)
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.max_images:
+                self._images.popitem(last=False)
+        return image
+
+    def prerender(self, case_obj: Dict[str, Any], formats: Tuple[str, ...] = ("png",)) -> Optional[str]:
+        """Renders the chart stage of a generated case ahead of time; returns its hash."""
+        chart_spec = (case_obj.get("stages", {}).get("chart") or {}).get("chart_spec")
+        if not chart_spec:
+            return None
+        try:
+            spec_hash = self.register(chart_spec)
+            for fmt in formats:
+                self.get(spec_hash, fmt)
+        except Exception as exc:
+            print(f"⚠️  Chart pre-render failed: {exc}")
+            return None
+        return spec_hash
+
+
 def render_chart(chart_spec: Dict[str, Any]) -> None:
     if chart_spec is None:
         return
-    renderer.render(chart_spec if isinstance(chart_spec, dict) else chart_spec.model_dump())
+    renderer.render(_as_dict(chart_spec))
 
 
 renderer = ChartRenderer()
@@ -0,0 +1,180 @@
+"""
+Cohort percentiles for report rubrics.
+
+Every (track, case type, rubric key) has a `ScoreSketch`: a fixed-width histogram of
+past scores over 0-5 in 0.1 steps (51 counters). That is exact for the integer
+consulting dimension scores and the one-decimal IB stage scores. Sketches are
+incremented when a new case is saved (persistence._update_score_sketches) and cached
+here with a refresh interval, so annotating a report costs one lookup per rubric
+however large the cohort is.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+SCORE_MIN = 0.0
+SCORE_MAX = 5.0
+RESOLUTION = 0.1
+BINS = int(round((SCORE_MAX - SCORE_MIN) / RESOLUTION)) + 1
+
+
+def sketch_key(track: str, case_type: Optional[str], rubric_key: str) -> str:
+    return f"{track}|{case_type or 'unknown'}|{rubric_key}"
+
+
+def report_samples(report: Dict[str, Any], track: str) -> List[Tuple[str, float]]:
+    """(sketch key, score) for each scored rubric; 0 means no evidence and isn't a sample."""
+    case_type = (report.get("case") or {}).get("type")
+    samples = []
+    for rubric in report.get("rubrics") or []:
+        score = rubric.get("score")
+        if isinstance(score, (int, float)) and score > 0:
+            samples.append((sketch_key(track, case_type, rubric["key"]), float(score)))
+    return samples
+
+
+class ScoreSketch:
+    __slots__ = ("counts", "_cumulative")
+
+    def __init__(self, counts: Optional[Sequence[int]] = None):
+        counts = list(counts or [])
+        self.counts: List[int] = (counts + [0] * BINS)[:BINS]
+        self._cumulative: Optional[List[int]] = None
+
+    @staticmethod
+    def bin_index(score: float) -> int:
+        idx = int(round((score - SCORE_MIN) / RESOLUTION))
+        return min(BINS - 1, max(0, idx))
+
+    @property
+    def total(self) -> int:
+        return self._prefix()[-1]
+
+    def _prefix(self) -> List[int]:
+        # cumulative[i] = samples in bins < i; built once per refresh, then lookups are O(1)
+        if self._cumulative is None:
+            cumulative = [0]
+            for count in self.counts:
+                cumulative.append(cumulative[-1] + count)
+            self._cumulative = cumulative
+        return self._cumulative
+
+    def add(self, score: float, n: int = 1) -> None:
+        self.counts[self.bin_index(score)] += n
+        self._cumulative = None
+
+    def percentile_rank(self, score: float) -> Optional[float]:
+        """Share of the cohort scoring below `score`, counting ties as half (0-100)."""
+        cumulative = self._prefix()
+        total = cumulative[-1]
+        if not total:
+            return None
+        idx = self.bin_index(score)
+        below, equal = cumulative[idx], self.counts[idx]
+        return round(100.0 * (below + equal / 2) / total, 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        cumulative = self._prefix()
+        total = cumulative[-1]
+        if not total:
+            return None
+        target = q * total
+        for idx in range(BINS):
+            if cumulative[idx + 1] >= target and self.counts[idx]:
+                return round(SCORE_MIN + idx * RESOLUTION, 1)
+        return SCORE_MAX
+
+
+class CohortBenchmarks:
+    """
+    In-memory cache of the stored sketches. `loader` returns {sketch key: counts};
+    the first annotate() loads synchronously, later refreshes run in the background.
+    """
+
+    def __init__(self, loader: Callable[[], Dict[str, Sequence[int]]], refresh_s: float = 300.0, min_cohort: int = 20):
+        self.loader = loader
+        self.refresh_s = refresh_s
+        self.min_cohort = min_cohort
+        self._sketches: Dict[str, ScoreSketch] = {}
+        self._loaded_at: Optional[float] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.stats = {"refreshes": 0, "refresh_failures": 0, "annotated": 0}
+
+    @classmethod
+    def from_env(cls, loader: Callable[[], Dict[str, Sequence[int]]]) -> "CohortBenchmarks":
+        return cls(
+            loader,
+            refresh_s=float(os.getenv("BENCHMARK_REFRESH_S", "300")),
+            min_cohort=int(os.getenv("BENCHMARK_MIN_COHORT", "20")),
+        )
+
+    def refresh(self) -> None:
+        try:
+            data = self.loader()
+        except Exception as exc:
+            self.stats["refresh_failures"] += 1
+            print(f"⚠️  Cohort benchmark refresh failed: {exc}")
+            data = None
+        with self._lock:
+            if data is not None:
+                self._sketches = {key: ScoreSketch(counts) for key, counts in data.items()}
+                self.stats["refreshes"] += 1
+            # a failed load also waits out refresh_s instead of retrying on every report
+            self._loaded_at = time.monotonic()
+            self._refreshing = False
+
+    def _ensure_fresh(self) -> None:
+        if self._loaded_at is None:
+            self.refresh()
+            return
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._loaded_at < self.refresh_s:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="benchmark-refresh", daemon=True).start()
+
+    def percentile(self, track: str, case_type: Optional[str], rubric_key: str, score: float) -> Tuple[Optional[float], int]:
+        """(percentile rank, cohort size); the rank is None below `min_cohort` samples."""
+        sketch = self._sketches.get(sketch_key(track, case_type, rubric_key))
+        if sketch is None:
+            return None, 0
+        total = sketch.total
+        if total < self.min_cohort:
+            return None, total
+        return sketch.percentile_rank(score), total
+
+    def annotate(self, report: Dict[str, Any], track: str) -> Dict[str, Any]:
+        """Adds `percentile` and `cohortSize` to each scored rubric of `report` (in place)."""
+        self._ensure_fresh()
+        case_type = (report.get("case") or {}).get("type")
+        for rubric in report.get("rubrics") or []:
+            score = rubric.get("score")
+            if not isinstance(score, (int, float)) or score <= 0:
+                continue
+            percentile, cohort_size = self.percentile(track, case_type, rubric["key"], score)
+            if percentile is not None:
+                rubric["percentile"] = percentile
+                rubric["cohortSize"] = cohort_size
+        self.stats["annotated"] += 1
+        return report
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "sketches": len(self._sketches)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cohort score sketches.")
+    parser.add_argument("--rebuild", action="store_true", help="recount all sketches from the stored reports")
+    args = parser.parse_args()
+    from persistence import load_score_sketches, rebuild_score_sketches
+
+    if args.rebuild:
+        print(f"✅ Rebuilt sketches from {rebuild_score_sketches()} cases")
+    for key, counts in sorted(load_score_sketches().items()):
+        sketch = ScoreSketch(counts)
+        print(f"{key}: n={sketch.total} p25={sketch.quantile(0.25)} p50={sketch.quantile(0.5)} p75={sketch.quantile(0.75)}")
@@ -0,0 +1,288 @@
+"""
+Columnar rubric aggregation for cohort analytics.
+
+`CohortScores` applies the same scoring as `InterviewController._collect_dimension_inputs`
+and `_compute_overall_band` to many sessions at once. Evaluations are folded into a
+session x criterion sum/count matrix using CRITERION_TO_DIMENSION. Dimension scores,
+overall bands, group means and percentiles are then NumPy array operations.
+`python cohort_scores.py` checks parity against the per-session code on random sessions
+and prints timings; `--from-supabase` summarizes the stored cases instead.
+"""
+import argparse
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+from controller import DEFAULT_BAND, OVERALL_BANDS
+from rubrics import CRITERION_TO_DIMENSION, DIMENSION_ORDER
+
+CRITERIA: List[str] = [c for dim in DIMENSION_ORDER for c in CRITERION_TO_DIMENSION if CRITERION_TO_DIMENSION[c] == dim]
+CRITERION_INDEX = {c: i for i, c in enumerate(CRITERIA)}
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+META_COLUMNS = ("case_type", "firm", "completed_at")
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("numpy is required for cohort aggregation.")
+
+
+def round_like_python(values, ndigits: int):
+    """
+    Elementwise `round(x, ndigits)` with Python's semantics. np.round scales by
+    10**ndigits first, which flips some near-tie doubles (e.g. 1/20); those few cells
+    fall back to the builtin so cohort numbers match per-session reports exactly.
+    """
+    if ndigits == 0:
+        return np.round(values)  # both round half to even on the exact double
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    out = np.round(scaled) / scale
+    near_tie = np.isfinite(values) & (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if near_tie.any():
+        out[near_tie] = [round(float(v), ndigits) for v in values[near_tie]]
+    return out
+
+
+def _month(completed_at: Optional[str]) -> str:
+    if not completed_at:
+        return "unknown"
+    try:
+        # reports store the display format; fall back to ISO timestamps
+        return datetime.strptime(completed_at, "%b %d, %Y %I:%M %p").strftime("%Y-%m")
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(completed_at).strftime("%Y-%m")
+    except ValueError:
+        return "unknown"
+
+
+class CohortScores:
+    def __init__(self, session_ids: Sequence[str], sums, counts, meta: Dict[str, List[Any]]):
+        _require_numpy()
+        self.session_ids = list(session_ids)
+        self.sums = sums  # sessions x criteria, float64
+        self.counts = counts  # sessions x criteria, int64
+        self.meta = meta
+        # criteria -> dimension membership, so dimension totals are one matmul
+        membership = np.zeros((len(CRITERIA), len(DIMENSION_ORDER)))
+        for i, criterion in enumerate(CRITERIA):
+            membership[i, DIMENSION_ORDER.index(CRITERION_TO_DIMENSION[criterion])] = 1.0
+        self._membership = membership
+
+    @classmethod
+    def from_sessions(cls, rows: Iterable[Mapping[str, Any]]) -> "CohortScores":
+        """
+        rows: {"id", "evaluations", and optionally "case_type", "firm", "completed_at"}.
+        The single Python pass here only flattens evaluations into index arrays.
+        """
+        _require_numpy()
+        session_ids: List[str] = []
+        meta: Dict[str, List[Any]] = {name: [] for name in META_COLUMNS}
+        flat_index: List[int] = []
+        flat_values: List[float] = []
+        width = len(CRITERIA)
+        for n, row in enumerate(rows):
+            session_ids.append(row.get("id", str(n)))
+            for name in META_COLUMNS:
+                meta[name].append(row.get(name))
+            base = n * width
+            for ev in row.get("evaluations") or []:
+                for criterion, value in (ev.get("scores") or {}).items():
+                    idx = CRITERION_INDEX.get(criterion)
+                    if idx is not None:
+                        flat_index.append(base + idx)
+                        flat_values.append(value)
+        size = len(session_ids) * width
+        index = np.asarray(flat_index, dtype=np.int64)
+        sums = np.bincount(index, weights=np.asarray(flat_values, dtype=np.float64), minlength=size)
+        counts = np.bincount(index, minlength=size)
+        shape = (len(session_ids), width)
+        return cls(session_ids, sums.reshape(shape), counts.reshape(shape), meta)
+
+    @classmethod
+    def from_case_rows(cls, case_rows: Iterable[Mapping[str, Any]]) -> "CohortScores":
+        """Supabase `cases` rows with `scoring_inputs` (see persistence.iter_regenerable_cases)."""
+
+        def rows():
+            for row in case_rows:
+                inputs = row.get("scoring_inputs") or {}
+                yield {
+                    "id": row.get("id"),
+                    "evaluations": inputs.get("evaluations"),
+                    "case_type": row.get("type") or inputs.get("case_type"),
+                    "firm": inputs.get("selected_firm"),
+                    "completed_at": row.get("completed_at"),
+                }
+
+        return cls.from_sessions(rows())
+
+    def __len__(self) -> int:
+        return len(self.session_ids)
+
+    # ---- per-session scores (controller parity) ----
+    def criterion_matrix(self):
+        """criteria x sessions mean scores; NaN where a criterion was never scored."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (self.sums / np.where(self.counts, self.counts, np.nan)).T
+
+    def criteria_scores(self):
+        """Per-session criterion means rounded as in `criteria_scores` of the report payload."""
+        return round_like_python(self.criterion_matrix(), 2)
+
+    def dimension_means(self):
+        """sessions x dimensions, rounded to one decimal; 0.0 where nothing was scored."""
+        dim_sums = self.sums @ self._membership
+        dim_counts = self.counts @ self._membership
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(dim_counts > 0, dim_sums / np.where(dim_counts > 0, dim_counts, 1), 0.0)
+        return round_like_python(means, 1)
+
+    def dimension_scores(self):
+        """The integer 0-5 `score` each dimension gets in a report."""
+        return round_like_python(self.dimension_means(), 0).astype(np.int64)
+
+    def overall_averages(self):
+        scores = self.dimension_scores()
+        scored = scores > 0
+        n = scored.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, (scores * scored).sum(axis=1) / np.where(n > 0, n, 1), np.nan)
+
+    def bands(self):
+        avg = self.overall_averages()
+        band = np.full(len(self), DEFAULT_BAND, dtype=object)
+        assigned = np.zeros(len(self), dtype=bool)
+        for threshold, name in OVERALL_BANDS:
+            hit = ~assigned & (avg >= threshold)  # NaN (nothing scored) never hits
+            band[hit] = name
+            assigned |= hit
+        return band
+
+    # ---- cohort statistics ----
+    def group_keys(self, by: str) -> List[str]:
+        if by == "month":
+            return [_month(v) for v in self.meta["completed_at"]]
+        if by not in self.meta:
+            raise ValueError(f"Unknown grouping '{by}'; use one of {list(self.meta) + ['month']}.")
+        return [v if v is not None else "unknown" for v in self.meta[by]]
+
+    @staticmethod
+    def _stats(scores, bands, percentiles: Sequence[float]) -> Dict[str, Any]:
+        dimensions = {}
+        for j, key in enumerate(DIMENSION_ORDER):
+            column = scores[:, j]
+            column = column[column > 0]  # 0 = no evidence, not a low score
+            entry: Dict[str, Any] = {"n": int(column.size)}
+            if column.size:
+                entry["mean"] = round(float(column.mean()), 2)
+                entry["percentiles"] = dict(zip((str(p) for p in percentiles), np.percentile(column, percentiles).round(2).tolist()))
+            dimensions[key] = entry
+        names, counts = np.unique(bands, return_counts=True) if len(bands) else ([], [])
+        return {
+            "sessions": int(scores.shape[0]),
+            "dimensions": dimensions,
+            "bands": {str(name): int(count) for name, count in zip(names, counts)},
+        }
+
+    def summary(self, by: Optional[str] = None, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        """Dimension means/percentiles and band counts, for the whole cohort or per group."""
+        scores = self.dimension_scores()
+        bands = self.bands()
+        if by is None:
+            return self._stats(scores, bands, percentiles)
+        keys = np.asarray(self.group_keys(by), dtype=object)
+        groups, inverse = np.unique(keys.astype(str), return_inverse=True)
+        return {
+            str(group): self._stats(scores[inverse == g], bands[inverse == g], percentiles)
+            for g, group in enumerate(groups)
+        }
+
+
+# ---- parity check / benchmark ----
+def _random_sessions(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    import random
+
+    rng = random.Random(seed)
+    stage_ids = ["structuring", "chart", "math", "creative", "recommendation", "case_intro"]
+    criteria = CRITERIA + ["not_a_criterion"]
+    sessions = []
+    for i in range(n):
+        evaluations = []
+        for _ in range(rng.randint(0, 12)):
+            picked = rng.sample(criteria, rng.randint(0, 5))
+            evaluations.append({
+                "stage_id": rng.choice(stage_ids),
+                "scores": {c: rng.randint(0, 5) for c in picked},
+                "notes": "n",
+                "student_last": "s",
+            })
+        sessions.append({"id": f"s{i}", "evaluations": evaluations, "case_type": rng.choice(["Profitability", "Market Entry"])})
+    return sessions
+
+
+def check_parity(n: int = 5000) -> Dict[str, Any]:
+    import time
+
+    from controller import InterviewController, session_from_scoring_inputs
+
+    rows = _random_sessions(n)
+    controller = InterviewController(case_store=None, llm_client=None, case_generator_fn=None)
+
+    started = time.perf_counter()
+    expected = []
+    for row in rows:
+        session = session_from_scoring_inputs(row["id"], {"evaluations": row["evaluations"]})
+        dims = controller._collect_dimension_inputs(session)
+        expected.append((dims, controller._compute_overall_band(dims)))
+    loop_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cohort = CohortScores.from_sessions(rows)
+    scores, bands, criteria = cohort.dimension_scores(), cohort.bands(), cohort.criteria_scores()
+    vector_s = time.perf_counter() - started
+
+    mismatches = 0
+    for i, (dims, band) in enumerate(expected):
+        got_criteria = {}
+        for dim in dims:
+            for criterion in dim["criteria_scores"]:
+                got_criteria[criterion] = float(criteria[CRITERION_INDEX[criterion], i])
+        if (
+            int((~np.isnan(criteria[:, i])).sum()) != len(got_criteria)
+            or [d["score"] for d in dims] != scores[i].tolist()
+            or band != bands[i]
+            or {c: v for d in dims for c, v in d["criteria_scores"].items()} != got_criteria
+        ):
+            mismatches += 1
+    return {"sessions": n, "mismatches": mismatches, "loop_ms": round(loop_s * 1000, 1), "vectorized_ms": round(vector_s * 1000, 1)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cohort rubric aggregation.")
+    parser.add_argument("--sessions", type=int, default=5000, help="random sessions for the parity check")
+    parser.add_argument("--from-supabase", action="store_true", help="summarize stored cases with scoring_inputs")
+    parser.add_argument("--by", choices=["case_type", "firm", "month"], help="group the summary")
+    args = parser.parse_args(argv)
+
+    if args.from_supabase:
+        from persistence import iter_regenerable_cases
+
+        columns = "id, type, completed_at, scoring_inputs"
+        rows = (row for page in iter_regenerable_cases(page_size=500, columns=columns) for row in page)
+        print(json.dumps(CohortScores.from_case_rows(rows).summary(by=args.by), indent=2))
+        return 0
+
+    result = check_parity(args.sessions)
+    print(json.dumps(result, indent=2))
+    return 1 if result["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
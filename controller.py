@@ -1,8 +1,12 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional, Literal
+from typing import List, Dict, Any, Optional, Literal, Callable, Tuple
+import os
 import time
+import uuid
 from datetime import datetime
 
+from case_store import thaw
+from events import Event
 from stages import STAGES, StageConfig
 from rubrics import DIMENSION_CONFIG, DIMENSION_ORDER, CRITERION_TO_DIMENSION, STAGE_DIMENSION_MAP
 from prompts import (
@@ -16,20 +20,26 @@ from prompts import (
     build_report_payload,
 )
 from schemas import ChartSpec, LLMStageEvaluation, CasePerformanceReport
+from eval_cache import (
+    EvalCache,
+    INTENT_NO_MORE_QUESTIONS,
+    classify_fast_path,
+    detect_intro_intent,
+)
 
 Role = Literal["student", "interviewer"]
 
+EVAL_TIMEOUT_S = float(os.getenv("LLM_EVAL_TIMEOUT_S", "30"))
+REPORT_TIMEOUT_S = float(os.getenv("LLM_REPORT_TIMEOUT_S", "90"))
+
+# (minimum average dimension score, band), checked in order
+OVERALL_BANDS = ((4.2, "Strong"), (3.2, "Solid"))
+DEFAULT_BAND = "Needs work"
+SCORING_INPUTS_VERSION = 1
+
 def now_ms() -> int:
     return int(time.time() * 1000)
 
-@dataclass
-class Event:
-    role: Role
-    stage_id: str
-    text: str
-    ts_ms: int
-    meta: Dict[str, Any] = field(default_factory=dict)
-
 @dataclass
 class Session:
     case_id: str
@@ -45,6 +55,38 @@ class Session:
     started_at_ms: Optional[int] = None
     completed_at_ms: Optional[int] = None
     case_report: Optional[Dict[str, Any]] = None
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+
+def finish_report(report: CasePerformanceReport, case_meta: Dict[str, Any], band: str) -> Dict[str, Any]:
+    # the model may paraphrase metadata or the band; the locally computed values win
+    report_dict = report.model_dump()
+    report_dict["case"] = case_meta
+    report_dict["overall"]["band"] = band
+    return report_dict
+
+
+def scoring_inputs(session: Session) -> Dict[str, Any]:
+    """What a finished session contributes to report regeneration (see regenerate_reports.py)."""
+    return {
+        "version": SCORING_INPUTS_VERSION,
+        "evaluations": session.evaluations,
+        "stage_feedback_notes": session.stage_feedback_notes,
+        # cohort grouping keys (cohort_scores.py)
+        "case_type": session.case_params.get("case_type"),
+        "selected_firm": session.selected_firm,
+    }
+
+
+def session_from_scoring_inputs(case_id: str, inputs: Dict[str, Any]) -> Session:
+    return Session(
+        case_id=case_id,
+        stage_index=len(STAGES),
+        substep="DONE",
+        evaluations=list(inputs.get("evaluations") or []),
+        stage_feedback_notes=list(inputs.get("stage_feedback_notes") or []),
+    )
+
 
 def advance_substep(stage: StageConfig, substep: str) -> str:
     if stage.pattern == "ask_probe":
@@ -57,10 +99,33 @@ def advance_substep(stage: StageConfig, substep: str) -> str:
     return substep
 
 class InterviewController:
-    def __init__(self, case_store, llm_client, case_generator_fn):
+    def __init__(
+        self,
+        case_store,
+        llm_client,
+        case_generator_fn,
+        eval_cache: Optional[EvalCache] = None,
+        intent_classifier: Optional[Callable[[str], Optional[str]]] = None,
+        benchmarks=None,
+    ):
         self.case_store = case_store
         self.llm = llm_client
         self.case_generator_fn = case_generator_fn
+        self.eval_cache = eval_cache or EvalCache()
+        # optional small local model consulted when the keyword rules are unsure
+        self.intent_classifier = intent_classifier
+        # optional cohort_benchmarks.CohortBenchmarks; adds per-rubric percentiles to live reports
+        self.benchmarks = benchmarks
+
+    def _detect_intro_intent(self, student_text: str) -> Optional[str]:
+        intent = detect_intro_intent(student_text)
+        if intent is None and self.intent_classifier is not None:
+            try:
+                intent = self.intent_classifier(student_text)
+            except Exception as exc:
+                print(f"⚠️  Intro intent classifier failed: {exc}")
+                intent = None
+        return intent
 
     def _ensure_case(self, session: Session) -> None:
         case_loaded = False
@@ -81,7 +146,7 @@ class InterviewController:
 
     def stage_history(self, session: Session, stage_id: str) -> List[Dict[str, Any]]:
         evs = [e for e in session.events if e.stage_id == stage_id]
-        return [{"role": e.role, "text": e.text, "ts_ms": e.ts_ms, "meta": e.meta} for e in evs]
+        return [{"role": e.role, "text": e.text, "ts_ms": e.ts_ms, "meta": dict(e.meta)} for e in evs]
 
     def pop_next_pending_output(self, session: Session) -> Optional[Dict[str, Any]]:
         if not session.pending_outputs:
@@ -136,7 +201,7 @@ class InterviewController:
             chart_spec = None
 
         elif stage.id == "chart":
-            chart_spec = s["chart_spec"]
+            chart_spec = thaw(s["chart_spec"])
             if session.substep in ("START", "PRIMARY_ASKED"):
                 utterance = s["primary_question"]
             else:
@@ -232,8 +297,15 @@ class InterviewController:
         # intro stage: clarifying loop rule (very simple MVP)
         # If student says "no" (or similar), move on. Otherwise treat as clarifying Q.
         if stage.id == "case_intro":
-            eval_out = self._run_evaluation_for_current_stage(session)
-            should_advance = bool(eval_out and eval_out.stage_should_advance)
+            intent = self._detect_intro_intent(student_text)
+            if intent is not None:
+                # local decision: no eval LLM call for the clarify loop
+                eval_out = None
+                should_advance = intent == INTENT_NO_MORE_QUESTIONS
+                print(f"[INTRO] local intent={intent}")
+            else:
+                eval_out = self._run_evaluation_for_current_stage(session)
+                should_advance = bool(eval_out and eval_out.stage_should_advance)
             if eval_out and eval_out.student_attempted_answer and stage.rubric:
                 eval_out.evaluation.should_evaluate = True
                 hist = self.stage_history(session, stage.id)
@@ -253,7 +325,14 @@ class InterviewController:
                 if pending:
                     return pending
                 return {"next_action": "ASK", "next_utterance": "Let's move into the case.", "chart_spec": None, "stage_id": stage.id}
-            return self._run_question_for_current_stage(session)
+            out = self._run_question_for_current_stage(session)
+            # utterances_this_stage counts the readout plus each clarify answer
+            clarify_rounds = session.utterances_this_stage - 1
+            if stage.max_clarify_rounds and clarify_rounds >= stage.max_clarify_rounds:
+                print(f"[INTRO] clarify cap of {stage.max_clarify_rounds} reached; moving on")
+                session.substep = "DONE"
+                self._complete_stage(session, stage)
+            return out
 
         # other stages: evaluate answer, then decide whether to ask another question
         eval_out = self._run_evaluation_for_current_stage(session)
@@ -309,8 +388,20 @@ class InterviewController:
     def _run_evaluation_for_current_stage(self, session: Session) -> Optional[LLMStageEvaluation]:
         stage = self.current_stage(session)
         hist = self.stage_history(session, stage.id)
-        if not any(ev["role"] == "student" for ev in hist):
+        student_last = next((ev["text"] for ev in reversed(hist) if ev["role"] == "student"), None)
+        if student_last is None:
             return None
+
+        fast = classify_fast_path(stage.id, student_last)
+        if fast is not None:
+            self.eval_cache.record_fast_path()
+            print(f"[EVAL] fast path for stage={stage.id}: {self.eval_cache.summary()}")
+            return fast
+        cached = self.eval_cache.get(stage.id, student_last, session.substep)
+        if cached is not None:
+            print(f"[EVAL] cache hit for stage={stage.id}: {self.eval_cache.summary()}")
+            return cached
+
         ctx = self.case_store.get_stage_context(session.case_id, stage.id)
         payload = build_eval_payload(
             stage_id=stage.id,
@@ -320,7 +411,10 @@ class InterviewController:
             case_context=ctx,
             stage_guidance=stage.guidance,
         )
-        return self.llm.run_json(EVAL_SYSTEM, payload, output_model=LLMStageEvaluation)
+        self.eval_cache.record_llm_call()
+        result = self.llm.run_json(EVAL_SYSTEM, payload, output_model=LLMStageEvaluation, timeout=EVAL_TIMEOUT_S)
+        self.eval_cache.put(stage.id, student_last, session.substep, result)
+        return result
 
     def _run_question_for_current_stage(self, session: Session) -> Dict[str, Any]:
         stage = self.current_stage(session)
@@ -343,7 +437,7 @@ class InterviewController:
         )
         out = self.llm.run_json(TURN_SYSTEM, payload, allowed_actions=stage.allowed_actions, forced_action=forced_action)
         if stage.needs_chart and stage_chart_spec and out.chart_spec is None:
-            out.chart_spec = ChartSpec.model_validate(stage_chart_spec)
+            out.chart_spec = ChartSpec.model_validate(thaw(stage_chart_spec))
         if forced_action and out.next_action != forced_action:
             # simplest MVP: override action but keep utterance
             out.next_action = forced_action
@@ -382,20 +476,30 @@ class InterviewController:
         }
 
     def _generate_case_report(self, session: Session, case: Dict[str, Any]) -> Dict[str, Any]:
+        return self.annotate_report(self.build_report(session, self._build_case_meta(session, case)))
+
+    def annotate_report(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        """Adds cohort percentiles to a consulting report when benchmarks are configured."""
+        if self.benchmarks is not None:
+            self.benchmarks.annotate(report, "consulting")
+        return report
+
+    def report_request(self, session: Session, case_meta: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """(REPORT_SYSTEM payload, overall band), computed locally from the session's evaluations."""
         dimension_inputs = self._collect_dimension_inputs(session)
         band = self._compute_overall_band(dimension_inputs)
-        case_meta = self._build_case_meta(session, case)
         payload = build_report_payload(
             case_meta=case_meta,
             overall_band=band,
             dimensions=dimension_inputs,
             stage_feedback_notes=session.stage_feedback_notes,
         )
-        report = self.llm.run_json(REPORT_SYSTEM, payload, output_model=CasePerformanceReport)
-        report_dict = report.model_dump()
-        report_dict["case"] = case_meta
-        report_dict["overall"]["band"] = band
-        return report_dict
+        return payload, band
+
+    def build_report(self, session: Session, case_meta: Dict[str, Any]) -> Dict[str, Any]:
+        payload, band = self.report_request(session, case_meta)
+        report = self.llm.run_json(REPORT_SYSTEM, payload, output_model=CasePerformanceReport, timeout=REPORT_TIMEOUT_S)
+        return finish_report(report, case_meta, band)
 
     def _build_case_meta(self, session: Session, case: Dict[str, Any]) -> Dict[str, Any]:
         title = case.get("title") or case.get("background", "Generated case").split(".")[0].strip()
@@ -469,10 +573,9 @@ class InterviewController:
     def _compute_overall_band(self, dimensions: List[Dict[str, Any]]) -> str:
         scores = [d["score"] for d in dimensions if d["score"] > 0]
         if not scores:
-            return "Needs work"
+            return DEFAULT_BAND
         avg = sum(scores) / len(scores)
-        if avg >= 4.2:
-            return "Strong"
-        if avg >= 3.2:
-            return "Solid"
-        return "Needs work"
+        for threshold, band in OVERALL_BANDS:
+            if avg >= threshold:
+                return band
+        return DEFAULT_BAND
@@ -0,0 +1,196 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from schemas import LLMStageEvaluation
+
+_PUNCT_RE = re.compile(r"[^\w\s']")
+_SPACE_RE = re.compile(r"\s+")
+
+# Utterances that mean "I'm done here" — the intro stage advances on these.
+ADVANCE_PHRASES = {
+    "no",
+    "nope",
+    "no thanks",
+    "no thank you",
+    "no questions",
+    "no more questions",
+    "no further questions",
+    "no more",
+    "none",
+    "not at the moment",
+    "not right now",
+    "i'm good",
+    "im good",
+    "i am good",
+    "all good",
+    "that's all",
+    "thats all",
+    "that's it",
+    "let's begin",
+    "lets begin",
+    "let's start",
+    "lets start",
+    "let's get started",
+    "let's move on",
+    "lets move on",
+    "i'm ready",
+    "im ready",
+    "ready",
+}
+
+# Utterances that never count as an attempted answer in a scored stage.
+NON_ANSWER_PHRASES = {
+    "skip",
+    "next",
+    "next question",
+    "pass",
+    "i don't know",
+    "i dont know",
+    "idk",
+    "no idea",
+    "not sure",
+    "i'd like to skip ahead to the next question",
+    "i want to skip",
+    "can we skip this",
+}
+
+INTENT_NO_MORE_QUESTIONS = "no_more_questions"
+INTENT_CLARIFYING_QUESTION = "clarifying_question"
+
+_NO = r"(no|nope|nah|not really|none)"
+# Whole-utterance patterns only (matched with fullmatch), so a "no" that opens a
+# longer sentence never ends the intro on its own.
+_NO_MORE_RE = re.compile(
+    rf"({_NO} )?{_NO}( (more|other|further))?( questions?)?( (from me|on my end|on my side))?"
+    rf"|{_NO} ((i'm|im|i am|we're|we are) )?(all )?(good|fine|clear|ready|set|covered)( to (go|begin|start))?"
+    rf"|{_NO} (let's|lets) (begin|start|get started|move on)"
+    r"|(i think )?(i have|i've got|ive got|i got) (no|none|nothing)( (more|else|further))?( questions?)?"
+    r"|(nothing|none) (else|more|further)( (from me|to ask))?"
+    r"|(that|this) (covers|answers) (it|everything)"
+)
+_QUESTION_START_RE = re.compile(
+    r"^(what|what's|whats|how|why|when|where|which|who|whom|whose|is|are|was|were|do|does|did|"
+    r"can|could|would|should|will|has|have|may|i was wondering|i'd like to know|i would like to know|"
+    r"could you clarify|can you clarify|just to clarify|to clarify)\b"
+)
+
+_FILLER_PREFIXES = ("um ", "uh ", "ok ", "okay ", "so ", "well ", "yeah ", "yes ")
+_FILLER_SUFFIXES = (" thanks", " thank you", " for now", " at this time")
+
+
+def normalize_text(text: str) -> str:
+    text = _PUNCT_RE.sub(" ", (text or "").lower().replace("’", "'"))
+    text = _SPACE_RE.sub(" ", text).strip()
+    changed = True
+    while changed and text:
+        changed = False
+        for prefix in _FILLER_PREFIXES:
+            if text.startswith(prefix):
+                text = text[len(prefix):]
+                changed = True
+        for suffix in _FILLER_SUFFIXES:
+            if text.endswith(suffix) and text != suffix.strip():
+                text = text[: -len(suffix)]
+                changed = True
+    return text.strip()
+
+
+def detect_intro_intent(text: str) -> Optional[str]:
+    """
+    Keyword/regex intent for the case_intro clarify loop. Returns None when the
+    rules are not confident so the caller can fall back to a model.
+    """
+    norm = normalize_text(text)
+    if not norm:
+        return None
+    # question check first: a "?" never ends the intro ("No, but what are the key questions?"),
+    # and an utterance that matches both rules ("No more questions?") goes to the classifier
+    is_question = "?" in (text or "") or bool(_QUESTION_START_RE.search(norm))
+    is_done = norm in ADVANCE_PHRASES or bool(_NO_MORE_RE.fullmatch(norm))
+    if is_question and is_done:
+        return None
+    if is_question:
+        return INTENT_CLARIFYING_QUESTION
+    if is_done:
+        return INTENT_NO_MORE_QUESTIONS
+    return None
+
+
+def classify_fast_path(stage_id: str, text: str) -> Optional[LLMStageEvaluation]:
+    """
+    Returns a canned evaluation for utterances whose outcome does not depend on
+    the case (advance signals and non-answers), or None when the LLM is needed.
+    """
+    norm = normalize_text(text)
+    if not norm:
+        return LLMStageEvaluation(student_attempted_answer=False, stage_should_advance=False)
+    if stage_id == "case_intro" and norm in ADVANCE_PHRASES and "?" not in text:
+        return LLMStageEvaluation(student_attempted_answer=False, stage_should_advance=True)
+    if stage_id != "case_intro" and norm in NON_ANSWER_PHRASES:
+        return LLMStageEvaluation(student_attempted_answer=False, stage_should_advance=False)
+    return None
+
+
+class EvalCache:
+    """
+    Bounded LRU of evaluation results keyed by (stage id, normalized student text, substep).
+
+    Only non-answers from scored stages are stored, with `stage_should_advance` forced
+    off: scored answers depend on the case context, and whether a short reply like "okay"
+    ends case_intro depends on the conversation, so both always go to the LLM.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"llm_calls": 0, "fast_path_hits": 0, "cache_hits": 0}
+        # called with (key, cached result) on every hit (e.g. replay.TranscriptRecorder)
+        self.hit_hooks: List[Callable[[Tuple[str, str, str], Dict], None]] = []
+
+    @staticmethod
+    def key(stage_id: str, text: str, substep: str) -> Tuple[str, str, str]:
+        return (stage_id, normalize_text(text), substep)
+
+    def get(self, stage_id: str, text: str, substep: str) -> Optional[LLMStageEvaluation]:
+        key = self.key(stage_id, text, substep)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["cache_hits"] += 1
+        for hook in self.hit_hooks:
+            hook(key, data)
+        return LLMStageEvaluation.model_validate(data)
+
+    def put(self, stage_id: str, text: str, substep: str, result: LLMStageEvaluation) -> None:
+        if stage_id == "case_intro" or result.student_attempted_answer:
+            return
+        key = self.key(stage_id, text, substep)
+        data = result.model_dump()
+        data["stage_should_advance"] = False
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_fast_path(self) -> None:
+        with self._lock:
+            self.stats["fast_path_hits"] += 1
+
+    def record_llm_call(self) -> None:
+        with self._lock:
+            self.stats["llm_calls"] += 1
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.stats)
+        total = stats["llm_calls"] + stats["fast_path_hits"] + stats["cache_hits"]
+        avoided = stats["fast_path_hits"] + stats["cache_hits"]
+        stats["avoided"] = avoided
+        stats["avoided_ratio"] = round(avoided / total, 3) if total else 0.0
+        return stats
@@ -0,0 +1,327 @@
+"""
+Append-only, per-session transcript log on local disk.
+
+`EventLog.sync(session_id, events)` only enqueues the events the log hasn't seen yet;
+a background thread batches them into JSON-lines segment files under
+`<root>/<session_id>/`, fsyncs according to the configured mode, rotates segments by
+size and closes them after `idle_close_s` without writes or when `release()` is called
+for a finished session, and periodically compacts closed segments into one gzip'd file.
+A failed write is kept and retried ahead of the session's newer events.
+`read_events` streams a session back in order for replay, analytics or crash recovery.
+"""
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+FSYNC_ALWAYS = "always"  # fsync after every batch write
+FSYNC_BATCH = "batch"  # fsync on rotation/compaction/close and at most once per fsync_interval_s
+FSYNC_OFF = "off"  # leave it to the OS
+
+SEGMENT_RE = re.compile(r"^(\d{8})\.log$")
+COMPACTED_NAME = "compacted.log.gz"
+_SAFE_ID_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class EventLog:
+    def __init__(
+        self,
+        root: str,
+        *,
+        fsync: str = FSYNC_BATCH,
+        flush_interval_s: float = 0.2,
+        fsync_interval_s: float = 1.0,
+        segment_max_bytes: int = 256 * 1024,
+        compact_min_segments: int = 4,
+        compact_interval_s: float = 60.0,
+        idle_close_s: float = 120.0,
+        max_tracked_sessions: int = 1024,
+        max_retry_records: int = 10000,
+    ):
+        if fsync not in (FSYNC_ALWAYS, FSYNC_BATCH, FSYNC_OFF):
+            raise ValueError(f"Unknown fsync mode '{fsync}'.")
+        self.root = root
+        self.fsync = fsync
+        self.flush_interval_s = flush_interval_s
+        self.fsync_interval_s = fsync_interval_s
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_min_segments = compact_min_segments
+        self.compact_interval_s = compact_interval_s
+        self.idle_close_s = idle_close_s
+        self.max_tracked_sessions = max_tracked_sessions
+        self.max_retry_records = max_retry_records
+        os.makedirs(root, exist_ok=True)
+
+        # (session, record) to append, (session, None) to close its segment, None to stop
+        self._queue: "queue.SimpleQueue[Optional[Tuple[str, Optional[Dict[str, Any]]]]]" = queue.SimpleQueue()
+        # session -> last seq handed to the queue; LRU-bounded, a dropped session re-reads its seq from disk
+        self._logged: "OrderedDict[str, int]" = OrderedDict()
+        self._files: Dict[str, Any] = {}  # session -> open segment file
+        self._last_write: Dict[str, float] = {}
+        self._last_fsync: Dict[str, float] = {}
+        # session -> items whose write failed; retried ahead of that session's newer items
+        self._retry: Dict[str, List[Optional[Dict[str, Any]]]] = {}
+        self._sync_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self.stats = {"appended": 0, "batches": 0, "fsyncs": 0, "rotations": 0, "idle_closes": 0, "compactions": 0,
+                      "write_failures": 0, "dropped": 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls) -> Optional["EventLog"]:
+        root = os.getenv("EVENT_LOG_DIR")
+        if not root:
+            return None
+        return cls(
+            root,
+            fsync=os.getenv("EVENT_LOG_FSYNC", FSYNC_BATCH),
+            flush_interval_s=float(os.getenv("EVENT_LOG_FLUSH_MS", "200")) / 1000,
+            idle_close_s=float(os.getenv("EVENT_LOG_IDLE_CLOSE_S", "120")),
+        )
+
+    # ---- producer side (request threads) ----
+    def sync(self, session_id: str, events: Sequence[Any]) -> int:
+        """Queues events[last_logged:] (each needs `to_dict()`); returns how many were queued."""
+        session_id = _SAFE_ID_RE.sub("_", session_id)
+        with self._sync_lock:
+            logged = self._logged.get(session_id)
+            if logged is None:
+                logged = self._last_seq_on_disk(session_id)
+            new = events[logged:]
+            for offset, event in enumerate(new):
+                self._queue.put((session_id, {"seq": logged + offset + 1, **event.to_dict()}))
+            self._logged[session_id] = logged + len(new)
+            self._logged.move_to_end(session_id)
+            while len(self._logged) > self.max_tracked_sessions:
+                self._logged.popitem(last=False)
+        return len(new)
+
+    def release(self, session_id: str) -> None:
+        """The session is finished or replaced: close its segment once queued events are written."""
+        session_id = _SAFE_ID_RE.sub("_", session_id)
+        with self._sync_lock:
+            self._logged.pop(session_id, None)
+            self._queue.put((session_id, None))
+
+    # ---- flusher thread ----
+    def _run(self) -> None:
+        last_compaction = time.monotonic()
+        while True:
+            batch, stop = self._next_batch()
+            if batch or self._retry:
+                self._write_batch(batch)
+            try:
+                self._close_idle()
+            except OSError as exc:
+                print(f"⚠️  Event log close failed: {exc}")
+            if time.monotonic() - last_compaction >= self.compact_interval_s:
+                last_compaction = time.monotonic()
+                self.compact_all()
+            if stop:
+                return
+
+    def _next_batch(self) -> Tuple[Dict[str, List[Optional[Dict[str, Any]]]], bool]:
+        """(queued items per session, whether close() was called); empty when nothing arrived."""
+        batch: Dict[str, List[Optional[Dict[str, Any]]]] = {}
+        try:
+            # wake up now and then even when nothing is logged, to close idle segments
+            # and retry failed writes
+            timeout = min(self.idle_close_s, self.compact_interval_s)
+            if self._retry:
+                timeout = min(timeout, self.fsync_interval_s)
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return batch, False
+        # let the batch fill for a moment so one write covers a whole turn
+        deadline = time.monotonic() + self.flush_interval_s
+        while item is not None:
+            batch.setdefault(item[0], []).append(item[1])
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return batch, False
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _write_batch(self, batch: Dict[str, List[Optional[Dict[str, Any]]]]) -> None:
+        with self._io_lock:
+            pending = {session_id: self._retry.pop(session_id) for session_id in list(self._retry)}
+            for session_id, items in batch.items():
+                pending.setdefault(session_id, []).extend(items)
+            for session_id, items in pending.items():
+                records = [r for r in items if r is not None]
+                try:
+                    if records:
+                        self._append(session_id, records)
+                    if None in items:
+                        self._close_segment(session_id)
+                except OSError as exc:
+                    self._write_failed(session_id, items, exc)
+            self.stats["batches"] += 1
+
+    def _write_failed(self, session_id: str, items: List[Optional[Dict[str, Any]]], exc: OSError) -> None:
+        """
+        Keeps the session's items for the next write; `sync()` has already counted them
+        as logged. The segment is dropped so the retry starts a fresh file instead of
+        appending after a torn line; records it did write are skipped by seq on read.
+        """
+        self.stats["write_failures"] += 1
+        print(f"⚠️  Event log write failed for {session_id}: {exc}")
+        fh = self._files.pop(session_id, None)
+        self._last_write.pop(session_id, None)
+        self._last_fsync.pop(session_id, None)
+        if fh is not None:
+            try:
+                fh.close()
+            except OSError:
+                pass
+        kept = items[-self.max_retry_records:]
+        self.stats["dropped"] += len(items) - len(kept)
+        self._retry[session_id] = kept
+
+    def _append(self, session_id: str, records: List[Dict[str, Any]]) -> None:
+        fh = self._segment(session_id)
+        fh.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+        fh.flush()
+        self.stats["appended"] += len(records)
+        now = time.monotonic()
+        self._last_write[session_id] = now
+        if self.fsync == FSYNC_ALWAYS or (
+            self.fsync == FSYNC_BATCH and now - self._last_fsync.get(session_id, 0.0) >= self.fsync_interval_s
+        ):
+            os.fsync(fh.fileno())
+            self._last_fsync[session_id] = now
+            self.stats["fsyncs"] += 1
+        if fh.tell() >= self.segment_max_bytes:
+            self._close_segment(session_id)
+            self.stats["rotations"] += 1
+
+    def _close_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_close_s
+        with self._io_lock:
+            for session_id in [sid for sid, at in self._last_write.items() if at <= cutoff]:
+                self._close_segment(session_id)
+                self.stats["idle_closes"] += 1
+
+    # ---- segments ----
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id)
+
+    def _segment_numbers(self, session_id: str) -> List[int]:
+        try:
+            names = os.listdir(self._session_dir(session_id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(m.group(1)) for m in map(SEGMENT_RE.match, names) if m)
+
+    def _segment(self, session_id: str):
+        fh = self._files.get(session_id)
+        if fh is None:
+            directory = self._session_dir(session_id)
+            os.makedirs(directory, exist_ok=True)
+            numbers = self._segment_numbers(session_id)
+            # never append to a segment left by a previous process; it may end mid-line
+            number = numbers[-1] + 1 if numbers else 1
+            fh = open(os.path.join(directory, f"{number:08d}.log"), "a", encoding="utf-8")
+            self._files[session_id] = fh
+        return fh
+
+    def _close_segment(self, session_id: str) -> None:
+        self._last_write.pop(session_id, None)
+        self._last_fsync.pop(session_id, None)
+        fh = self._files.pop(session_id, None)
+        if fh is not None:
+            fh.flush()
+            if self.fsync != FSYNC_OFF:
+                os.fsync(fh.fileno())
+            fh.close()
+
+    def _last_seq_on_disk(self, session_id: str) -> int:
+        last = 0
+        for record in self.read_events(session_id):
+            last = record.get("seq", last)
+        return last
+
+    # ---- compaction ----
+    def compact(self, session_id: str) -> bool:
+        """
+        Folds closed segments (and any earlier compacted file) into one gzip'd file. A
+        session that is still being written waits for `compact_min_segments`; an idle or
+        released one is compacted whatever its segments' size.
+        """
+        with self._io_lock:
+            open_fh = self._files.get(session_id)
+            open_name = os.path.basename(open_fh.name) if open_fh is not None else None
+            closed = [n for n in self._segment_numbers(session_id) if f"{n:08d}.log" != open_name]
+            if not closed or (open_fh is not None and len(closed) < self.compact_min_segments):
+                return False
+            directory = self._session_dir(session_id)
+            target = os.path.join(directory, COMPACTED_NAME)
+            tmp_path = f"{target}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as out:
+                for line in self._iter_lines(target, compressed=True):
+                    out.write(line)
+                for number in closed:
+                    for line in self._iter_lines(os.path.join(directory, f"{number:08d}.log")):
+                        out.write(line)
+            os.replace(tmp_path, target)
+            for number in closed:
+                os.remove(os.path.join(directory, f"{number:08d}.log"))
+            self.stats["compactions"] += 1
+            return True
+
+    def compact_all(self) -> None:
+        try:
+            session_ids = [e.name for e in os.scandir(self.root) if e.is_dir()]
+        except OSError:
+            return
+        for session_id in session_ids:
+            try:
+                self.compact(session_id)
+            except (OSError, ValueError) as exc:
+                print(f"⚠️  Event log compaction failed for {session_id}: {exc}")
+
+    # ---- readers ----
+    @staticmethod
+    def _iter_lines(path: str, compressed: bool = False) -> Iterator[str]:
+        opener = gzip.open if compressed else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    if line.endswith("\n"):  # a torn final line from a crash is skipped
+                        yield line
+        except FileNotFoundError:
+            return
+
+    def read_events(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        session_id = _SAFE_ID_RE.sub("_", session_id)
+        directory = self._session_dir(session_id)
+        last_seq = 0
+        sources = [(os.path.join(directory, COMPACTED_NAME), True)]
+        sources += [(os.path.join(directory, f"{n:08d}.log"), False) for n in self._segment_numbers(session_id)]
+        for path, compressed in sources:
+            for line in self._iter_lines(path, compressed):
+                record = json.loads(line)
+                if record.get("seq", 0) <= last_seq:
+                    continue  # duplicate from a retried write
+                last_seq = record["seq"]
+                yield record
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        with self._io_lock:
+            for session_id in list(self._files):
+                self._close_segment(session_id)
@@ -0,0 +1,120 @@
+"""
+Compact transcript event records shared by the consulting and IB flows.
+
+Events are slotted (no per-instance __dict__), role/stage/action strings are
+interned so thousands of events share one copy, and the action gets its own slot so
+a meta dict is only allocated for extra non-None values (e.g. a chart spec).
+`python events.py` prints bytes per event before/after.
+"""
+import sys
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+def _split_meta(meta: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """(interned action, remaining non-None meta or None); most events carry only an action."""
+    if not meta:
+        return None, None
+    action = meta.get("action")
+    extra = {k: v for k, v in meta.items() if k != "action" and v is not None}
+    return (sys.intern(action) if isinstance(action, str) else None), (extra or None)
+
+
+class Event:
+    __slots__ = ("role", "stage_id", "text", "ts_ms", "action", "_extra")
+
+    def __init__(self, role: str, stage_id: str, text: str, ts_ms: int = 0, meta: Optional[Dict[str, Any]] = None):
+        self.role = sys.intern(role)
+        self.stage_id = sys.intern(stage_id)
+        self.text = text
+        self.ts_ms = ts_ms
+        self.action, self._extra = _split_meta(meta)
+
+    @property
+    def meta(self) -> Mapping[str, Any]:
+        # rebuilt on access from the slots, so it is read-only: writing to it would be lost
+        meta = {"action": self.action} if self.action is not None else {}
+        if self._extra:
+            meta.update(self._extra)
+        return MappingProxyType(meta)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"role": self.role, "stage_id": self.stage_id, "text": self.text, "ts_ms": self.ts_ms, **self.meta}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Event):
+            return NotImplemented
+        return (self.role, self.stage_id, self.text, self.ts_ms, self.action, self._extra) == (
+            other.role, other.stage_id, other.text, other.ts_ms, other.action, other._extra
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Event(role={self.role!r}, stage_id={self.stage_id!r}, text={self.text!r}, "
+            f"ts_ms={self.ts_ms!r}, meta={dict(self.meta)!r})"
+        )
+
+
+def _deep_size(obj: Any, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_size(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(_deep_size(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+def benchmark(n: int = 5000) -> Dict[str, float]:
+    """Bytes per event for the old dataclass/dict records vs. the slotted ones."""
+    from dataclasses import dataclass, field
+
+    @dataclass
+    class LegacyEvent:
+        role: str
+        stage_id: str
+        text: str
+        ts_ms: int
+        meta: Dict[str, Any] = field(default_factory=dict)
+
+    stage_ids = ["case_intro", "structuring", "chart", "math", "creative", "recommendation"]
+
+    def rows():
+        for i in range(n):
+            # runtime-built strings, as they come back from snapshots/JSON rather than literals
+            role = "".join(["interviewer" if i % 2 else "student"])
+            stage_id = "".join([stage_ids[i % len(stage_ids)]])
+            meta = {"action": "".join(["ASK_PRIMARY"]), "chart_spec": None} if i % 2 else {}
+            yield role, stage_id, f"utterance {i}", 1_700_000_000_000 + i, meta
+
+    # shared text is excluded from the comparison: only per-record overhead differs
+    texts = set()
+    legacy, compact, ib_legacy, ib_compact = [], [], [], []
+    for role, stage_id, text, ts_ms, meta in rows():
+        texts.add(id(text))
+        legacy.append(LegacyEvent(role, stage_id, text, ts_ms, dict(meta)))
+        compact.append(Event(role, stage_id, text, ts_ms, meta))
+        ib_legacy.append({"role": role, "stage_id": stage_id, "text": text})
+        ib_compact.append(Event(role, stage_id, text, ts_ms))
+
+    def per_event(records) -> float:
+        seen = set(texts)
+        return round((_deep_size(records, seen) - sys.getsizeof(records)) / n, 1)
+
+    return {
+        "consulting_before": per_event(legacy),
+        "consulting_after": per_event(compact),
+        "ib_before": per_event(ib_legacy),
+        "ib_after": per_event(ib_compact),  # now also carries ts_ms
+    }
+
+
+if __name__ == "__main__":
+    for label, value in benchmark().items():
+        print(f"{label}: {value} bytes/event")
@@ -28,3 +28,118 @@ class AudioManager {
 }
 
 window.audioManager = new AudioManager();
+
+// Streaming STT: rotates the MediaRecorder at pauses so each segment is a standalone
+// file the server can transcribe while the candidate keeps talking. A segment lasts at
+// least STT_SEGMENT_MIN_MS and is cut at the next pause; STT_SEGMENT_MAX_MS is a hard cap
+// for candidates who never pause. The page reports speech through noteSound().
+const STT_SEGMENT_MIN_MS = 4000;
+const STT_SEGMENT_MAX_MS = 12000;
+const STT_PAUSE_MS = 400;
+const STT_CHECK_MS = 100;
+
+class StreamingTranscriber extends EventTarget {
+  constructor(stream, options = {}) {
+    super();
+    this.stream = stream;
+    this.options = options;
+    this.streamId =
+      (window.crypto && window.crypto.randomUUID && window.crypto.randomUUID()) ||
+      `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    this.state = "inactive";
+    this.recorder = null;
+    this.rotateTimer = null;
+    this.segmentStartedAt = 0;
+    this.lastSoundAt = 0;
+    this.nextSeq = 0;
+    this.uploads = [];
+    this.hasAudio = false;
+  }
+
+  start() {
+    this.state = "recording";
+    this.lastSoundAt = Date.now();
+    this._startSegment();
+    this.rotateTimer = setInterval(() => this._maybeRotate(), STT_CHECK_MS);
+  }
+
+  noteSound(now = Date.now()) {
+    this.lastSoundAt = now;
+  }
+
+  stop() {
+    if (this.state !== "recording") return;
+    this.state = "inactive";
+    clearInterval(this.rotateTimer);
+    this.rotateTimer = null;
+    const last = this.recorder;
+    this.recorder = null;
+    last.addEventListener("stop", () => this.dispatchEvent(new Event("stop")), { once: true });
+    last.stop();
+  }
+
+  async transcript() {
+    await Promise.all(this.uploads);
+    if (!this.hasAudio) return "";
+    const form = new FormData();
+    form.append("stream_id", this.streamId);
+    form.append("final", "1");
+    form.append("count", String(this.nextSeq));
+    const resp = await fetch("/api/transcribe/chunk", { method: "POST", body: form });
+    const payload = await resp.json().catch(() => ({}));
+    if (!resp.ok) throw new Error(payload.error || "Transcription failed");
+    return (payload.text || "").trim();
+  }
+
+  _startSegment() {
+    const recorder = new MediaRecorder(this.stream, this.options);
+    const chunks = [];
+    recorder.addEventListener("dataavailable", (event) => {
+      if (event.data && event.data.size > 0) chunks.push(event.data);
+    });
+    const uploaded = new Promise((resolve) => {
+      recorder.addEventListener("stop", () => {
+        const blob = new Blob(chunks, { type: recorder.mimeType || "audio/webm" });
+        resolve(blob);
+      });
+    }).then((blob) => this._upload(blob));
+    this.uploads.push(uploaded);
+    recorder.start();
+    this.recorder = recorder;
+    this.segmentStartedAt = Date.now();
+  }
+
+  _maybeRotate() {
+    const now = Date.now();
+    const elapsed = now - this.segmentStartedAt;
+    const paused = now - this.lastSoundAt >= STT_PAUSE_MS;
+    if (elapsed >= STT_SEGMENT_MAX_MS || (elapsed >= STT_SEGMENT_MIN_MS && paused)) {
+      this._rotate();
+    }
+  }
+
+  _rotate() {
+    const previous = this.recorder;
+    this._startSegment();
+    previous.stop();
+  }
+
+  async _upload(blob) {
+    if (!blob.size) return;
+    const seq = this.nextSeq;
+    this.nextSeq += 1;
+    this.hasAudio = true;
+    const form = new FormData();
+    form.append("stream_id", this.streamId);
+    form.append("seq", String(seq));
+    form.append("audio", blob, `segment_${seq}.webm`);
+    const resp = await fetch("/api/transcribe/chunk", { method: "POST", body: form });
+    const payload = await resp.json().catch(() => ({}));
+    if (!resp.ok) throw new Error(payload.error || "Segment upload failed");
+    if (payload.partial) {
+      this.dispatchEvent(new CustomEvent("partial", { detail: payload.partial }));
+    }
+  }
+}
+
+window.StreamingTranscriber = StreamingTranscriber;
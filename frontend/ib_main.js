@@ -14,7 +14,6 @@ let recognition = null;
 let useSpeechRecognition = false;
 let mediaRecorder = null;
 let mediaStream = null;
-let recordedChunks = [];
 let isRecording = false;
 let voiceEnabled = false;
 let recordingInterval = null;
@@ -29,9 +28,14 @@ let lastSoundTimestamp = 0;
 let loadingDepth = 0;
 let interviewDone = false;
 let ibReportRedirected = false;
+let eventLog = [];
+let eventCursor = 0;
 
 const SILENCE_THRESHOLD = 0.02;
 const SILENCE_DURATION_MS = 1500;
+// Speech only needs 16 kHz mono; smaller uploads mean faster transcription.
+const SPEECH_AUDIO_CONSTRAINTS = { channelCount: 1, sampleRate: 16000, echoCancellation: true, noiseSuppression: true };
+const SPEECH_BITRATE = 24000;
 
 recordBtn.disabled = true;
 
@@ -85,9 +89,12 @@ function fallbackSpeak(text) {
   window.speechSynthesis.speak(utterance);
 }
 
-function updateEvents(events) {
-  if (!Array.isArray(events)) return;
-  const lastInterviewer = [...events].reverse().find((evt) => evt.role === "interviewer");
+// The server only sends events newer than `since`; `reset` means it sent the full list.
+function updateEvents(data) {
+  if (!Array.isArray(data.events)) return;
+  eventLog = data.reset ? data.events : eventLog.concat(data.events);
+  eventCursor = typeof data.cursor === "number" ? data.cursor : eventLog.length;
+  const lastInterviewer = [...data.events].reverse().find((evt) => evt.role === "interviewer");
   if (lastInterviewer) {
     setPrompt(lastInterviewer.text);
   }
@@ -159,15 +166,14 @@ async function startMediaRecording() {
     return;
   }
   try {
-    mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    mediaStream = await navigator.mediaDevices.getUserMedia({ audio: SPEECH_AUDIO_CONSTRAINTS });
   } catch (err) {
     setVoiceStatus("Mic permission denied");
     return;
   }
-  recordedChunks = [];
-  mediaRecorder = new MediaRecorder(mediaStream);
-  mediaRecorder.addEventListener("dataavailable", (event) => {
-    if (event.data && event.data.size > 0) recordedChunks.push(event.data);
+  mediaRecorder = new StreamingTranscriber(mediaStream, { audioBitsPerSecond: SPEECH_BITRATE });
+  mediaRecorder.addEventListener("partial", (event) => {
+    setVoiceStatus(`Hearing: “${event.detail}”`);
   });
   mediaRecorder.addEventListener("stop", () => {
     cleanupAudioAnalysis();
@@ -216,6 +222,7 @@ function setupAudioAnalysis(stream) {
     const now = Date.now();
     if (rms > SILENCE_THRESHOLD) {
       lastSoundTimestamp = now;
+      if (mediaRecorder && mediaRecorder.noteSound) mediaRecorder.noteSound(now);
     } else if (now - lastSoundTimestamp > SILENCE_DURATION_MS) {
       stopMediaRecording();
     }
@@ -235,20 +242,14 @@ function cleanupAudioAnalysis() {
 }
 
 async function transcribeRecording() {
-  if (!recordedChunks.length) {
+  const recorder = mediaRecorder;
+  if (!recorder) {
     setVoiceStatus("No speech detected");
     return;
   }
   setVoiceStatus("Processing voice…");
-  const blob = new Blob(recordedChunks, { type: "audio/webm" });
-  recordedChunks = [];
-  const formData = new FormData();
-  formData.append("audio", blob, "response.webm");
   try {
-    const resp = await fetch("/api/transcribe", { method: "POST", body: formData });
-    const payload = await resp.json().catch(() => ({}));
-    if (!resp.ok) throw new Error(payload.error || "Transcription failed");
-    const text = (payload.text || "").trim();
+    const text = await recorder.transcript();
     if (text) {
       setVoiceStatus("Mic ready");
       sendResponse(text);
@@ -345,7 +346,7 @@ async function startSession() {
       method: "POST",
       body: JSON.stringify({ product_group: product, industry_group: industry }),
     });
-    updateEvents(data.events);
+    updateEvents(data);
     if (data.turns && data.turns.length) {
       const utterance = data.turns[data.turns.length - 1].next_utterance;
       speak(utterance);
@@ -364,9 +365,9 @@ async function sendResponse(text) {
   try {
     const data = await api("/api/ib/respond", {
       method: "POST",
-      body: JSON.stringify({ text }),
+      body: JSON.stringify({ text, since: eventCursor }),
     });
-    updateEvents(data.events);
+    updateEvents(data);
     if (data.turns && data.turns.length) {
       const utterance = data.turns[data.turns.length - 1].next_utterance;
       speak(utterance);
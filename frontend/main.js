@@ -19,7 +19,6 @@ let recognition = null;
 let useSpeechRecognition = false;
 let mediaRecorder = null;
 let mediaStream = null;
-let recordedChunks = [];
 let isRecording = false;
 let voiceEnabled = false;
 let recordingInterval = null;
@@ -34,9 +33,14 @@ let lastSoundTimestamp = 0;
 let loadingDepth = 0;
 let reportRedirected = false;
 let recordingStartMs = 0;
+let eventLog = [];
+let eventCursor = 0;
 
 const SILENCE_THRESHOLD = 0.02;
 const SILENCE_DURATION_MS = 1500;
+// Speech only needs 16 kHz mono; smaller uploads mean faster transcription.
+const SPEECH_AUDIO_CONSTRAINTS = { channelCount: 1, sampleRate: 16000, echoCancellation: true, noiseSuppression: true };
+const SPEECH_BITRATE = 24000;
 const MIN_RECORDING_MS = 4000;
 
 recordBtn.disabled = true;
@@ -53,6 +57,14 @@ async function api(path, options = {}) {
   return resp.json();
 }
 
+// The server only sends events newer than `since`; `reset` means it sent the full list.
+function applyEventDelta(data) {
+  if (!Array.isArray(data.events)) return eventLog;
+  eventLog = data.reset ? data.events : eventLog.concat(data.events);
+  eventCursor = typeof data.cursor === "number" ? data.cursor : eventLog.length;
+  return eventLog;
+}
+
 function updatePrompt(events) {
   if (!Array.isArray(events) || !events.length) {
     const placeholderOptions = currentPromptEl.dataset.placeholderOptions;
@@ -79,7 +91,9 @@ function renderChart(spec) {
     chartInstance = null;
   }
   tableContainer.innerHTML = "";
-  const ctx = document.getElementById("chartCanvas").getContext("2d");
+  const canvas = document.getElementById("chartCanvas");
+  canvas.style.display = "";
+  const ctx = canvas.getContext("2d");
 
   if (spec.type === "table") {
     const table = document.createElement("table");
@@ -147,10 +161,30 @@ function renderChart(spec) {
   });
 }
 
+function renderChartImage(url, spec) {
+  if (chartInstance) {
+    chartInstance.destroy();
+    chartInstance = null;
+  }
+  tableContainer.innerHTML = "";
+  document.getElementById("chartCanvas").style.display = "none";
+  const img = document.createElement("img");
+  img.src = url;
+  img.alt = (spec && spec.title) || "Case exhibit";
+  img.className = "chart-image";
+  img.onerror = () => {
+    tableContainer.innerHTML = "";
+    renderChart(spec);
+  };
+  tableContainer.appendChild(img);
+}
+
 function handleTurns(turns) {
   if (!turns) return;
   const chartTurn = [...turns].reverse().find((t) => t.chart_spec);
-  if (chartTurn) {
+  if (chartTurn && chartTurn.chart_image) {
+    renderChartImage(chartTurn.chart_image, chartTurn.chart_spec);
+  } else if (chartTurn) {
     renderChart(chartTurn.chart_spec);
   }
   const latest = turns[turns.length - 1];
@@ -281,7 +315,7 @@ async function startMediaRecording() {
     return;
   }
   try {
-    mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    mediaStream = await navigator.mediaDevices.getUserMedia({ audio: SPEECH_AUDIO_CONSTRAINTS });
   } catch (err) {
     console.error("Unable to access microphone:", err);
     setVoiceStatus("Mic permission denied");
@@ -289,12 +323,9 @@ async function startMediaRecording() {
   }
 
   recordingStartMs = Date.now();
-  recordedChunks = [];
-  mediaRecorder = new MediaRecorder(mediaStream);
-  mediaRecorder.addEventListener("dataavailable", (event) => {
-    if (event.data && event.data.size > 0) {
-      recordedChunks.push(event.data);
-    }
+  mediaRecorder = new StreamingTranscriber(mediaStream, { audioBitsPerSecond: SPEECH_BITRATE });
+  mediaRecorder.addEventListener("partial", (event) => {
+    setVoiceStatus(`Hearing: “${event.detail}”`);
   });
   mediaRecorder.addEventListener("stop", () => {
     cleanupAudioAnalysis();
@@ -339,6 +370,7 @@ function setupAudioAnalysis(stream) {
     const now = Date.now();
     if (rms > SILENCE_THRESHOLD) {
       lastSoundTimestamp = now;
+      if (mediaRecorder && mediaRecorder.noteSound) mediaRecorder.noteSound(now);
     } else if (now - lastSoundTimestamp > SILENCE_DURATION_MS && hasMetMinimumRecordingTime()) {
       stopMediaRecording();
     }
@@ -369,22 +401,14 @@ function stopMediaRecording() {
 }
 
 async function transcribeRecording() {
-  if (!recordedChunks.length) {
+  const recorder = mediaRecorder;
+  if (!recorder) {
     setVoiceStatus("No speech detected");
     return;
   }
   setVoiceStatus("Processing voice…");
-  const blob = new Blob(recordedChunks, { type: "audio/webm" });
-  recordedChunks = [];
-  const formData = new FormData();
-  formData.append("audio", blob, "response.webm");
   try {
-    const resp = await fetch("/api/transcribe", { method: "POST", body: formData });
-    const payload = await resp.json().catch(() => ({}));
-    if (!resp.ok) {
-      throw new Error(payload.error || "Transcription failed");
-    }
-    const text = (payload.text || "").trim();
+    const text = await recorder.transcript();
     if (text) {
       setVoiceStatus("Mic ready");
       sendResponse(text);
@@ -493,7 +517,7 @@ async function startCase() {
       method: "POST",
       body: JSON.stringify(payload),
     });
-    updatePrompt(data.events);
+    updatePrompt(applyEventDelta(data));
     handleTurns(data.turns);
     return true;
   } catch (err) {
@@ -509,9 +533,9 @@ async function sendResponse(text) {
   try {
     const data = await api("/api/respond", {
       method: "POST",
-      body: JSON.stringify({ text }),
+      body: JSON.stringify({ text, since: eventCursor }),
     });
-    updatePrompt(data.events);
+    updatePrompt(applyEventDelta(data));
     handleTurns(data.turns);
   } catch (err) {
     alert(err.message);
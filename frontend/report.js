@@ -57,6 +57,12 @@ function renderRubrics(rubrics) {
     title.className = "rubric-title";
     title.textContent = rubric.title;
     info.appendChild(title);
+    if (rubric.percentile != null) {
+      const percentile = document.createElement("p");
+      percentile.className = "rubric-percentile";
+      percentile.textContent = `Ahead of ${Math.round(rubric.percentile)}% of ${rubric.cohortSize} candidates`;
+      info.appendChild(percentile);
+    }
 
     const score = document.createElement("span");
     score.className = "rubric-score";
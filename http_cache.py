@@ -0,0 +1,91 @@
+"""
+Response compression and conditional GET helpers for the Flask API.
+
+`register_compression(app)` gzips (or brotli-encodes, when the `brotli` package is
+installed) JSON/text responses above a size floor. `conditional_json` serves
+immutable payloads such as reports with a strong content-hash ETag and answers
+matching If-None-Match requests with an empty 304.
+"""
+import gzip
+import hashlib
+import os
+from typing import Any, Optional
+
+from flask import Flask, Response, current_app, request
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None  # type: ignore
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESSIBLE_TYPES = {"application/json", "image/svg+xml", "text/html", "text/css", "text/plain", "application/javascript"}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # favours speed; these responses are built per request
+ENCODINGS = ("br", "gzip")
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    if (
+        response.direct_passthrough
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # a strong validator must differ per content-coding
+        response.set_etag(f"{etag}-{encoding}")
+    return response
+
+
+def register_compression(app: Flask) -> None:
+    app.after_request(compress_response)
+
+
+def conditional(response: Response, etag: str) -> Response:
+    """
+    Sets a strong ETag and answers If-None-Match with an empty 304. compress_response
+    suffixes the ETag per content-coding, so those variants match too.
+    """
+    response.set_etag(etag)
+    for candidate in [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]:
+        if request.if_none_match.contains(candidate):
+            response.status_code = 304
+            response.set_data(b"")
+            response.set_etag(candidate)
+            break
+    return response
+
+
+def conditional_json(payload: Any) -> Response:
+    """JSON response with a strong ETag over its bytes; 304 when the client already has it."""
+    body = current_app.json.dumps(payload)
+    etag = hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+    response = Response(body, mimetype="application/json")
+    # per-user data: the browser may keep it but must revalidate before reuse
+    response.headers["Cache-Control"] = "private, no-cache"
+    return conditional(response, etag)
@@ -4,12 +4,17 @@ import os
 from openai import OpenAI
 
 from ib_session import IBInterviewSession, PRODUCT_GUIDES, SECTOR_GUIDES
-from llm_client import LLMClient
+from llm_client import LLMClient, LLMCallPolicy
 
 
 def run_cli(args):
     client = OpenAI()
-    llm = LLMClient(client=client, model=os.getenv("MODEL", "gpt-4.1"))
+    llm = LLMClient(
+        client=client,
+        model=os.getenv("MODEL", "gpt-4.1"),
+        fallback_model=os.getenv("FALLBACK_MODEL"),
+        policy=LLMCallPolicy.from_env(),
+    )
 
     session = IBInterviewSession(
         llm_client=llm,
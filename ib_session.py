@@ -1,11 +1,15 @@
+import hashlib
 import json
 import os
 import random
 import time
+import uuid
 from dataclasses import dataclass, field
+from functools import lru_cache
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from events import Event
 from llm_client import LLMClient
 from prompts import IB_REPORT_SYSTEM, build_ib_report_payload
 from schemas import CasePerformanceReport
@@ -73,16 +77,27 @@ DEFAULT_ACCOUNTING = "questions/accounting.json"
 DEFAULT_VALUATION = "questions/valuation.json"
 
 
-def _load_guide(path: str) -> List[Dict]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+@lru_cache(maxsize=None)
+def _read_guide(path: str) -> Tuple[List[Dict], str]:
+    with open(path, "rb") as f:
+        raw = f.read()
+    data = json.loads(raw)
     if not isinstance(data, list):
         raise ValueError(f"Guide at {path} must be a JSON list.")
-    return data
+    return data, hashlib.sha1(raw).hexdigest()[:12]
+
+
+def _load_guide(path: str) -> List[Dict]:
+    # guides are read-only, so every session shares one parsed copy
+    return _read_guide(path)[0]
+
+
+def _entry_key(entry: Dict) -> str:
+    return entry.get("id", entry["question"])
 
 
 def _choose_entry(entries: List[Dict], used: set) -> Dict:
-    pool = [e for e in entries if e.get("id", e.get("question")) not in used]
+    pool = [e for e in entries if _entry_key(e) not in used]
     if not pool:
         raise RuntimeError("Ran out of unique questions in the guide.")
     return random.choice(pool)
@@ -95,6 +110,7 @@ class IBStage:
     agent: str
     entries: List[Dict]
     used_ids: set = field(default_factory=set)
+    guide: Optional[str] = None
 
 
 class IBInterviewSession:
@@ -106,6 +122,7 @@ class IBInterviewSession:
         industry_group: str,
         accounting_guide: str = DEFAULT_ACCOUNTING,
         valuation_guide: str = DEFAULT_VALUATION,
+        benchmarks=None,
     ):
         if product_group not in PRODUCT_GUIDES:
             raise ValueError(f"Unknown product group '{product_group}'.")
@@ -113,6 +130,8 @@ class IBInterviewSession:
             raise ValueError(f"Unknown industry group '{industry_group}'.")
 
         self.llm = llm_client
+        self.benchmarks = benchmarks  # optional cohort_benchmarks.CohortBenchmarks
+        self.session_id = uuid.uuid4().hex
         self.product_group = product_group
         self.industry_group = industry_group
         self.started_at_ms: Optional[int] = None
@@ -120,19 +139,26 @@ class IBInterviewSession:
         self.report_data: Optional[Dict[str, Any]] = None
 
         self.stages: List[IBStage] = [
-            IBStage("accounting", "Accounting Fundamentals", "Lena (Accounting VP)", _load_guide(accounting_guide)),
-            IBStage("valuation", "Valuation Basics", "Marco (Valuation Specialist)", _load_guide(valuation_guide)),
-            IBStage("product", "Product Group Specifics", "Priya (Product Lead)", _load_guide(PRODUCT_GUIDES[product_group])),
-            IBStage("sector", "Industry Nuances", "Noah (Industry Partner)", _load_guide(SECTOR_GUIDES[industry_group])),
+            IBStage("accounting", "Accounting Fundamentals", "Lena (Accounting VP)", _load_guide(accounting_guide), guide=accounting_guide),
+            IBStage("valuation", "Valuation Basics", "Marco (Valuation Specialist)", _load_guide(valuation_guide), guide=valuation_guide),
+            IBStage("product", "Product Group Specifics", "Priya (Product Lead)", _load_guide(PRODUCT_GUIDES[product_group]), guide=PRODUCT_GUIDES[product_group]),
+            IBStage("sector", "Industry Nuances", "Noah (Industry Partner)", _load_guide(SECTOR_GUIDES[industry_group]), guide=SECTOR_GUIDES[industry_group]),
         ]
 
         self.stage_index = 0
         self.substate = "initial"  # primary, followup, done
         self.previous_answer = ""
         self.current_stage_state: Optional[Dict] = None
-        self.events: List[Dict] = []
+        self.events: List[Event] = []
         self.evaluations: List[Dict] = []
         self.case_title = f"{industry_group} · {product_group} IB interview"
+        self._init_entry_hooks()
+
+    def _init_entry_hooks(self) -> None:
+        # picks each stage's guide entry; replay.py swaps in the recorded picks
+        self.entry_picker: Callable[[List[Dict], set], Dict] = _choose_entry
+        # called with (stage id, entry key) after each pick (e.g. replay.TranscriptRecorder)
+        self.entry_hooks: List[Callable[[str, str], None]] = []
 
     # ---- public API ----
     def start(self) -> str:
@@ -178,19 +204,95 @@ class IBInterviewSession:
             if self.completed_at_ms is None:
                 self.completed_at_ms = self._now_ms()
             self.report_data = self._build_report_dict()
+            if self.benchmarks is not None:
+                self.benchmarks.annotate(self.report_data, "ib")
             return "", True
 
         question = self._start_stage()
         return question, False
 
-    def serialize_events(self) -> List[Dict]:
-        return list(self.events)
+    def serialize_events(self, start: int = 0) -> List[Dict]:
+        return [{"seq": start + offset + 1, **ev.to_dict()} for offset, ev in enumerate(self.events[start:])]
+
+    # ---- snapshots ----
+    def to_snapshot(self) -> Dict[str, Any]:
+        """
+        Plain-data state for session_snapshot. Guide entries are referenced by guide
+        path + index (with a content digest) instead of being copied.
+        """
+        stages = []
+        for stage in self.stages:
+            used = [idx for idx, entry in enumerate(stage.entries) if _entry_key(entry) in stage.used_ids]
+            stages.append({
+                "id": stage.id,
+                "title": stage.title,
+                "agent": stage.agent,
+                "guide": stage.guide,
+                "digest": _read_guide(stage.guide)[1],
+                "used": used,
+            })
+        current = None
+        if self.current_stage_state:
+            current = {k: v for k, v in self.current_stage_state.items() if k not in ("stage", "entry")}
+            stage = self.current_stage_state["stage"]
+            current["stage_index"] = self.stages.index(stage)
+            current["entry_index"] = stage.entries.index(self.current_stage_state["entry"])
+        return {
+            "session_id": self.session_id,
+            "product_group": self.product_group,
+            "industry_group": self.industry_group,
+            "started_at_ms": self.started_at_ms,
+            "completed_at_ms": self.completed_at_ms,
+            "report_data": self.report_data,
+            "stages": stages,
+            "stage_index": self.stage_index,
+            "substate": self.substate,
+            "previous_answer": self.previous_answer,
+            "current_stage_state": current,
+            "events": [[e.role, e.stage_id, e.text, e.ts_ms] for e in self.events],
+            "evaluations": self.evaluations,
+            "case_title": self.case_title,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any], *, llm_client: LLMClient, benchmarks=None) -> "IBInterviewSession":
+        session = cls.__new__(cls)
+        session.llm = llm_client
+        session.benchmarks = benchmarks
+        session._init_entry_hooks()
+        session.session_id = data.get("session_id") or uuid.uuid4().hex
+        session.stages = []
+        for item in data["stages"]:
+            entries, digest = _read_guide(item["guide"])
+            if digest != item["digest"]:
+                raise ValueError(f"Guide '{item['guide']}' changed since the snapshot was taken.")
+            used_ids = {_entry_key(entries[idx]) for idx in item["used"]}
+            session.stages.append(IBStage(item["id"], item["title"], item["agent"], entries, used_ids, guide=item["guide"]))
+        for attr in (
+            "product_group", "industry_group", "started_at_ms", "completed_at_ms", "report_data",
+            "stage_index", "substate", "previous_answer", "evaluations", "case_title",
+        ):
+            setattr(session, attr, data[attr])
+        # v1 snapshots stored IB events as {role, stage_id, text} dicts
+        session.events = [Event(**row) if isinstance(row, dict) else Event(*row) for row in data["events"]]
+        session.current_stage_state = None
+        current = data.get("current_stage_state")
+        if current:
+            state = dict(current)
+            stage = session.stages[state.pop("stage_index")]
+            state["stage"] = stage
+            state["entry"] = stage.entries[state.pop("entry_index")]
+            session.current_stage_state = state
+        return session
 
     # ---- helpers ----
     def _start_stage(self) -> str:
         stage = self.stages[self.stage_index]
-        entry = _choose_entry(stage.entries, stage.used_ids)
-        stage.used_ids.add(entry.get("id", entry["question"]))
+        entry = self.entry_picker(stage.entries, stage.used_ids)
+        key = _entry_key(entry)
+        stage.used_ids.add(key)
+        for hook in self.entry_hooks:
+            hook(stage.id, key)
 
         payload = {
             "base_question": entry["question"],
@@ -265,11 +367,7 @@ class IBInterviewSession:
         return "\n".join(lines)
 
     def _record_event(self, role: str, text: str, stage_id: str) -> None:
-        self.events.append({
-            "role": role,
-            "stage_id": stage_id,
-            "text": text,
-        })
+        self.events.append(Event(role, stage_id, text, self._now_ms()))
 
     def get_report(self) -> Optional[Dict[str, Any]]:
         return self.report_data
@@ -325,10 +423,29 @@ class IBInterviewSession:
             data["case"] = case_meta
             data["overall"]["band"] = band
             data["overall"]["averageScore"] = avg_score
+            data["rubrics"] = self._align_rubrics(data["rubrics"], stage_rows)
             return data
         except Exception:
             return self._manual_report(case_meta, band, avg_score, stage_rows)
 
+    @staticmethod
+    def _align_rubrics(rubrics: List[Dict[str, Any]], stage_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        One rubric per stage, keyed by stage id with the stage's own score: cohort sketches
+        and progress stats are keyed on rubric keys, so they can't be whatever the model
+        wrote. Rubrics are matched by key, else by position; raises if a stage is missing.
+        """
+        by_key = {rubric.get("key"): rubric for rubric in rubrics}
+        aligned = []
+        for idx, stage in enumerate(stage_rows):
+            rubric = by_key.get(stage["id"])
+            if rubric is None and len(rubrics) == len(stage_rows):
+                rubric = rubrics[idx]
+            if rubric is None:
+                raise ValueError(f"Report has no rubric for stage '{stage['id']}'.")
+            aligned.append({**rubric, "key": stage["id"], "score": stage["score"]})
+        return aligned
+
     def _manual_report(
         self,
         case_meta: Dict[str, Any],
@@ -1,31 +1,283 @@
 import json
-from typing import Any, Dict
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
 from schemas import LLMTurnOutput
 
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"}
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    raw = os.getenv(name)
+    if raw is None or raw == "":
+        return default
+    return float(raw)
+
+
+@dataclass
+class LLMCallPolicy:
+    timeout_s: float = 60.0
+    deadline_s: Optional[float] = None  # total budget across retries; defaults to the call's timeout
+    max_retries: int = 2
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    hedge_enabled: bool = False
+    hedge_delay_s: float = 8.0  # used until enough latency samples exist for a p95
+    hedge_min_delay_s: float = 1.0
+    hedge_max_in_flight: int = 4
+    min_attempt_s: float = 2.0  # don't start a retry with less budget than this left
+    breaker_threshold: int = 3
+    breaker_cooldown_s: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "LLMCallPolicy":
+        policy = cls()
+        policy.timeout_s = _env_float("LLM_TIMEOUT_S", policy.timeout_s)
+        policy.deadline_s = _env_float("LLM_DEADLINE_S", policy.deadline_s)
+        policy.max_retries = int(_env_float("LLM_MAX_RETRIES", policy.max_retries))
+        policy.hedge_enabled = os.getenv("LLM_HEDGE", "").lower() in {"1", "true", "yes"}
+        policy.hedge_delay_s = _env_float("LLM_HEDGE_DELAY_S", policy.hedge_delay_s)
+        policy.breaker_threshold = int(_env_float("LLM_BREAKER_THRESHOLD", policy.breaker_threshold))
+        policy.breaker_cooldown_s = _env_float("LLM_BREAKER_COOLDOWN_S", policy.breaker_cooldown_s)
+        return policy
+
+
+def _fragment_default(obj: Any) -> Any:
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_payload(payload: Dict[str, Any]) -> str:
+    """
+    json.dumps that splices in pre-serialized values: any object carrying a
+    `json_fragment` string (e.g. a case_store.StageContext) is emitted verbatim.
+    """
+    fragments: Dict[str, str] = {}
+    marker = uuid.uuid4().hex
+
+    def default(obj: Any) -> Any:
+        fragment = getattr(obj, "json_fragment", None)
+        if isinstance(fragment, str):
+            token = f"{marker}:{len(fragments)}"
+            fragments[json.dumps(token)] = fragment
+            return token
+        return _fragment_default(obj)
+
+    text = json.dumps(payload, default=default)
+    for token, fragment in fragments.items():
+        text = text.replace(token, fragment, 1)
+    return text
+
+
+class LazyClient:
+    """Defers building an SDK client (and importing its package) until first attribute access."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+def lazy_openai_client() -> LazyClient:
+    def factory():
+        from openai import OpenAI
+
+        return OpenAI()
+
+    return LazyClient(factory)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures so calls route to the fallback model for a cooldown."""
+
+    def __init__(self, threshold: int, cooldown_s: float):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at >= self.cooldown_s:
+                # half-open: let the next call probe the primary model
+                self._opened_at = None
+                self._failures = self.threshold - 1
+                return False
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                print(f"⚠️  LLM circuit breaker opened after {self._failures} failures.")
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if type(exc).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    return getattr(exc, "status_code", None) in TRANSIENT_STATUS_CODES
+
+
 class LLMClient:
-    def __init__(self, client, model: str):
+    def __init__(self, client, model: str, *, fallback_model: Optional[str] = None, policy: Optional[LLMCallPolicy] = None):
         self.client = client
         self.model = model
+        self.fallback_model = fallback_model
+        self.policy = policy or LLMCallPolicy()
+        self.breaker = CircuitBreaker(self.policy.breaker_threshold, self.policy.breaker_cooldown_s)
+        self._latencies = deque(maxlen=100)
+        self._hedge_pool = None
+        if self.policy.hedge_enabled:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=self.policy.hedge_max_in_flight, thread_name_prefix="llm-hedge")
+            # one slot per pool worker, so a hedge is skipped rather than queued behind abandoned ones
+            self._hedge_slots = threading.BoundedSemaphore(self.policy.hedge_max_in_flight)
+        # called with each raw model output on the caller's thread (e.g. replay.TranscriptRecorder)
+        self.output_hooks: List[Callable[[str], None]] = []
 
-    def run_json(self, system_prompt: str, payload: Dict[str, Any], *, allowed_actions=None, forced_action=None, output_model=LLMTurnOutput):
-        print("\n" + "="*80)
-        print("🤖 LLM CALL (JSON)")
-        print("- Model:", self.model)
-        print("- System prompt:")
-        print(system_prompt)
-        print("- User payload:")
-        print(json.dumps(payload, indent=2))
-        print("="*80)
+    def _active_model(self) -> str:
+        if self.fallback_model and self.breaker.is_open():
+            return self.fallback_model
+        return self.model
+
+    def _hedge_delay(self) -> float:
+        if len(self._latencies) < 20:
+            return self.policy.hedge_delay_s
+        ordered = sorted(self._latencies)
+        p95 = ordered[int(0.95 * (len(ordered) - 1))]
+        return max(self.policy.hedge_min_delay_s, p95)
 
+    def _create_once(self, model: str, system_prompt: str, payload: Dict[str, Any], timeout: float) -> str:
+        started = time.monotonic()
         resp = self.client.responses.create(
-            model=self.model,
+            model=model,
             input=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": json.dumps(payload)}
+                {"role": "user", "content": dumps_payload(payload)}
             ],
+            timeout=timeout,
         )
+        self._latencies.append(time.monotonic() - started)
+        return resp.output_text.strip()
+
+    @staticmethod
+    def _start_primary(fn, *args) -> Future:
+        # the primary gets its own thread instead of a pool worker, so it never waits in a queue
+        future: Future = Future()
+
+        def run():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        threading.Thread(target=run, name="llm-primary", daemon=True).start()
+        return future
+
+    def _submit_hedge(self, *args) -> Optional[Future]:
+        if not self._hedge_slots.acquire(blocking=False):
+            print("⚠️  Hedge pool busy; waiting on the primary LLM request only.")
+            return None
+        future = self._hedge_pool.submit(self._create_once, *args)
+        future.add_done_callback(lambda _: self._hedge_slots.release())
+        return future
+
+    def _create_hedged(self, model: str, system_prompt: str, payload: Dict[str, Any], timeout: float) -> str:
+        args = (model, system_prompt, payload, timeout)
+        futures = [self._start_primary(self._create_once, *args)]
+        done, _ = wait(futures, timeout=min(timeout, self._hedge_delay()))
+        if not done:
+            hedge = self._submit_hedge(*args)
+            if hedge is not None:
+                print("⏱️  LLM call slower than p95; firing hedged request.")
+                futures.append(hedge)
+        pending = set(futures)
+        last_exc: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                exc = fut.exception()
+                if exc is None:
+                    return fut.result()
+                last_exc = exc
+        raise last_exc
 
-        text = resp.output_text.strip()
+    def _create(self, system_prompt: str, payload: Dict[str, Any], timeout: Optional[float] = None, deadline: Optional[float] = None) -> str:
+        timeout = timeout or self.policy.timeout_s
+        # one budget for all attempts and backoff sleeps, so retries can't outlast the caller's request
+        budget = deadline or self.policy.deadline_s or timeout
+        give_up_at = time.monotonic() + budget
+        attempts = max(1, self.policy.max_retries + 1)
+        for attempt in range(1, attempts + 1):
+            model = self._active_model()
+            attempt_timeout = min(timeout, give_up_at - time.monotonic())
+            try:
+                if self._hedge_pool is not None:
+                    text = self._create_hedged(model, system_prompt, payload, attempt_timeout)
+                else:
+                    text = self._create_once(model, system_prompt, payload, attempt_timeout)
+            except Exception as exc:
+                transient = is_transient_error(exc)
+                if model == self.model and transient:
+                    # a rejected request (400, bad schema) says nothing about the model's health
+                    self.breaker.record_failure()
+                if attempt >= attempts or not transient:
+                    raise
+                delay = min(self.policy.backoff_max_s, self.policy.backoff_base_s * (2 ** (attempt - 1)))
+                delay = random.uniform(0, delay)  # full jitter
+                if give_up_at - time.monotonic() - delay < self.policy.min_attempt_s:
+                    print(f"⚠️  LLM call failed on {model} ({type(exc).__name__}); {budget:.0f}s deadline leaves no time to retry.")
+                    raise
+                print(f"⚠️  LLM call failed on {model} ({type(exc).__name__}); retry {attempt}/{attempts - 1} in {delay:.2f}s.")
+                time.sleep(delay)
+                continue
+            if model == self.model:
+                self.breaker.record_success()
+            for hook in self.output_hooks:
+                hook(text)
+            return text
+        raise RuntimeError("LLM call exhausted retries.")
+
+    def run_json(self, system_prompt: str, payload: Dict[str, Any], *, allowed_actions=None, forced_action=None, output_model=LLMTurnOutput, timeout: Optional[float] = None, deadline: Optional[float] = None):
+        print("\n" + "="*80)
+        print("🤖 LLM CALL (JSON)")
+        print("- Model:", self._active_model())
+        print("- System prompt:")
+        print(system_prompt)
+        print("- User payload:")
+        print(json.dumps(payload, indent=2, default=_fragment_default))
+        print("="*80)
+
+        text = self._create(system_prompt, payload, timeout, deadline)
 
         print("\n" + "-"*80)
         print("🧠 LLM RAW OUTPUT")
@@ -49,25 +301,17 @@ class LLMClient:
 
         return output_model.model_validate(data)
 
-    def run_text(self, system_prompt: str, payload: Dict[str, Any]) -> str:
+    def run_text(self, system_prompt: str, payload: Dict[str, Any], *, timeout: Optional[float] = None, deadline: Optional[float] = None) -> str:
         print("\n" + "="*80)
         print("🤖 LLM CALL (TEXT / FEEDBACK)")
-        print("- Model:", self.model)
+        print("- Model:", self._active_model())
         print("- System prompt:")
         print(system_prompt)
         print("- User payload:")
-        print(json.dumps(payload, indent=2))
+        print(json.dumps(payload, indent=2, default=_fragment_default))
         print("="*80)
 
-        resp = self.client.responses.create(
-            model=self.model,
-            input=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": json.dumps(payload)}
-            ],
-        )
-
-        text = resp.output_text.strip()
+        text = self._create(system_prompt, payload, timeout, deadline)
 
         print("\n" + "-"*80)
         print("🧠 LLM FEEDBACK OUTPUT")
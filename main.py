@@ -1,14 +1,11 @@
 import os
 import argparse
-from openai import OpenAI
 
 from case_store import CaseStore
-from llm_client import LLMClient
+from llm_client import LLMClient, LLMCallPolicy, lazy_openai_client
 from controller import Session, InterviewController
 from case_generator import generate_case, CONSULTING_CASE_TYPES
 from stages import STAGES
-from voice import create_voice_interface
-from chart_renderer import render_chart
 
 
 def main():
@@ -16,6 +13,7 @@ def main():
     parser.add_argument("--theme", default="pricing for a SaaS product")
     parser.add_argument("--difficulty", default="medium")
     parser.add_argument("--voice_max_seconds", type=int, default=12)
+    parser.add_argument("--barge_in", action="store_true", help="let the candidate interrupt playback (use headphones)")
     parser.add_argument("--firm", choices=["McKinsey", "Bain", "BCG"], default="McKinsey")
     parser.add_argument("--case_type", choices=CONSULTING_CASE_TYPES, default="Profitability")
     args = parser.parse_args()
@@ -24,14 +22,21 @@ def main():
         if not turn:
             return
         if turn.get("chart_spec"):
+            from chart_renderer import render_chart  # matplotlib loads on the first exhibit
+
             print("\n[CHART_SPEC]:", turn["chart_spec"])
             render_chart(turn["chart_spec"])
         print("\nINTERVIEWER:", turn["next_utterance"])
         voice.speak(turn["next_utterance"])
 
     # --- setup deps ---
-    client = OpenAI()
-    llm = LLMClient(client=client, model=os.getenv("MODEL", "gpt-4.1"))
+    client = lazy_openai_client()
+    llm = LLMClient(
+        client=client,
+        model=os.getenv("MODEL", "gpt-4.1"),
+        fallback_model=os.getenv("FALLBACK_MODEL"),
+        policy=LLMCallPolicy.from_env(),
+    )
     case_store = CaseStore()
 
     def controller_case_generator(**params):
@@ -54,7 +59,9 @@ def main():
         case_params={"case_type": args.case_type},
         selected_firm=args.firm,
     )
-    voice = create_voice_interface(client, max_seconds=args.voice_max_seconds)
+    from voice import create_voice_interface  # sounddevice/numpy only once voice is needed
+
+    voice = create_voice_interface(client, max_seconds=args.voice_max_seconds, barge_in=args.barge_in)
 
     # Always begin from the case intro and proceed sequentially.
     out = controller.start(session)  # reads case + asks for clarifying questions
@@ -76,6 +83,7 @@ def main():
         for pending in controller.flush_pending_outputs(session):
             display_turn(pending)
 
+    voice.wait_until_done()
     print("\n--- Interview complete ---")
 
 
@@ -1,6 +1,30 @@
-from typing import Dict, Any, List, Tuple
+import base64
+import json
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Any, Iterator, List, Optional, Sequence, Tuple
 
-from supabase_client import supabase
+from cohort_benchmarks import BINS, ScoreSketch, report_samples
+from supabase_client import get_supabase
+
+# unique constraints backing the upserts (see DEPLOYMENT.md)
+CASE_CONFLICT_KEY = "user_id,title,completed_at"
+RUBRIC_CONFLICT_KEY = "case_id,key"
+
+RECENT_SCORE_WINDOW = 10
+PROGRESS_COLUMNS = "case_count, rubric_stats, track_stats, type_stats, recent_scores"
+PROGRESS_WRITE_ATTEMPTS = 5
+
+# what the dashboard list renders; the full report_json stays out of list queries
+CASE_SUMMARY_COLUMNS = (
+    "id, title, type, industry, completed_at, duration_sec, overall_band, overall_score, "
+    "focus_keys, high_keys, track, case_rubrics(key, title, score)"
+)
+# what report regeneration reads back; only cases saved with scoring_inputs qualify
+REGEN_COLUMNS = "id, user_id, report_json, scoring_inputs"
+SKETCH_COLUMNS = "key, counts"
+REPORT_ONLY_RUBRIC_FIELDS = ("percentile", "cohortSize")
 
 
 def _avg(values: List[float]) -> float:
@@ -19,30 +43,16 @@ def _infer_track(report: Dict[str, Any]) -> str:
     return "consulting"
 
 
-def save_case_report(user_id: str, report: Dict[str, Any]) -> str:
-    if supabase is None:
-        raise RuntimeError("Supabase not configured")
+def _rubric_row(case_id: str, user_id: str, rubric: Dict[str, Any]) -> Dict[str, Any]:
+    # cohort percentiles stay in report_json; they are relative to when the report was made
+    row = {k: v for k, v in rubric.items() if k not in REPORT_ONLY_RUBRIC_FIELDS}
+    return {"case_id": case_id, "user_id": user_id, **row}
+
 
+def _case_payload(user_id: str, report: Dict[str, Any]) -> Dict[str, Any]:
     rubrics = report.get("rubrics", [])
-    overall_score = _avg([r.get("score", 0) for r in rubrics])
-    focus_keys = _key_order(rubrics)[:2]
-    high_keys = _key_order(rubrics, reverse=True)[:2]
     case_meta = report["case"]
-
-    # prevent duplicate saves if the report page refreshes
-    existing = (
-        supabase.table("cases")
-        .select("id")
-        .eq("user_id", user_id)
-        .eq("title", case_meta["title"])
-        .eq("completed_at", case_meta["completedAt"])
-        .limit(1)
-        .execute()
-    )
-    if existing.data:
-        return existing.data[0]["id"]
-
-    case_payload = {
+    return {
         "user_id": user_id,
         "title": case_meta["title"],
         "type": case_meta["type"],
@@ -51,53 +61,267 @@ def save_case_report(user_id: str, report: Dict[str, Any]) -> str:
         "duration_sec": case_meta["durationSec"],
         "overall_band": report["overall"]["band"],
         "executive_summary": report["overall"]["executiveSummary"],
-        "overall_score": overall_score,
-        "focus_keys": focus_keys,
-        "high_keys": high_keys,
+        "overall_score": _avg([r.get("score", 0) for r in rubrics]),
+        "focus_keys": _key_order(rubrics)[:2],
+        "high_keys": _key_order(rubrics, reverse=True)[:2],
         "track": _infer_track(report),
         "report_json": report,
     }
 
-    response = supabase.table("cases").insert(case_payload).execute()
-    case_id = response.data[0]["id"]
 
-    try:
-        for rubric in rubrics:
-            supabase.table("case_rubrics").insert({
-                "case_id": case_id,
-                "user_id": user_id,
-                **rubric,
-            }).execute()
-    except Exception:
-        supabase.table("cases").delete().eq("id", case_id).execute()
-        raise
+def save_case_report(user_id: str, report: Dict[str, Any], scoring_inputs: Optional[Dict[str, Any]] = None) -> str:
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Supabase not configured")
+
+    rubrics = report.get("rubrics", [])
+    case_meta = report["case"]
+    case_payload = _case_payload(user_id, report)
+    if scoring_inputs is not None:
+        case_payload["scoring_inputs"] = scoring_inputs
+
+    # A refreshed report page re-saves the same case; the unique key turns that into
+    # a no-op instead of needing a pre-read, and only then do we look the id up.
+    response = (
+        supabase.table("cases")
+        .upsert(case_payload, on_conflict=CASE_CONFLICT_KEY, ignore_duplicates=True)
+        .execute()
+    )
+    if response.data:
+        case_id = response.data[0]["id"]
+    else:
+        existing = (
+            supabase.table("cases")
+            .select("id")
+            .eq("user_id", user_id)
+            .eq("title", case_meta["title"])
+            .eq("completed_at", case_meta["completedAt"])
+            .limit(1)
+            .execute()
+        )
+        case_id = existing.data[0]["id"]
+
+    if rubrics:
+        # one bulk write; upserting keeps retries idempotent, so no compensating delete
+        rows = [_rubric_row(case_id, user_id, rubric) for rubric in rubrics]
+        (
+            supabase.table("case_rubrics")
+            .upsert(rows, on_conflict=RUBRIC_CONFLICT_KEY, returning="minimal")
+            .execute()
+        )
+
+    # Each aggregate follows its own flag on the case, not whether this call inserted it:
+    # if an earlier save failed after the case upsert, or one of its aggregate updates
+    # failed, the retry folds in exactly what is still missing.
+    _aggregate_once(
+        supabase, case_id, "aggregated",
+        lambda: _update_progress(supabase, user_id, {**case_payload, "id": case_id}, rubrics),
+        f"Progress aggregate update failed for {user_id}",
+    )
+    _aggregate_once(
+        supabase, case_id, "sketched",
+        lambda: _update_score_sketches(supabase, report_samples(report, case_payload["track"])),
+        f"Cohort sketch update failed for case {case_id}",
+    )
 
     return case_id
 
 
-def list_cases(user_id: str, limit: int = 10, offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+def _aggregate_once(supabase, case_id: str, flag: str, update: Callable[[], None], failure: str) -> None:
+    """
+    Runs `update` only for the save that flips cases.<flag> false -> true, so concurrent
+    re-saves of one case can't count it twice. A failed update flips the flag back and
+    leaves the case for the next save; the case itself is saved either way, since a
+    stale aggregate is better than a failed save.
+    """
+    if not _set_aggregation_flag(supabase, case_id, flag, True):
+        return
+    try:
+        update()
+    except Exception as exc:
+        print(f"⚠️  {failure}: {exc}")
+        try:
+            _set_aggregation_flag(supabase, case_id, flag, False)
+        except Exception as release_exc:
+            print(f"⚠️  Could not release {flag} for case {case_id}: {release_exc}")
+
+
+def _set_aggregation_flag(supabase, case_id: str, flag: str, value: bool) -> bool:
+    """Compare-and-set of cases.<flag> to `value`; True if this call changed it."""
+    resp = (
+        supabase.table("cases")
+        .update({flag: value}, count="exact", returning="minimal")
+        .eq("id", case_id)
+        .eq(flag, not value)
+        .execute()
+    )
+    return bool(resp.count)
+
+
+def empty_progress() -> Dict[str, Any]:
+    return {"case_count": 0, "rubric_stats": {}, "track_stats": {}, "type_stats": {}, "recent_scores": []}
+
+
+def _add_sample(stats: Dict[str, Dict[str, float]], key: str, value: float) -> None:
+    entry = stats.setdefault(key, {"count": 0, "mean": 0.0})
+    entry["count"] += 1
+    entry["mean"] += (value - entry["mean"]) / entry["count"]
+
+
+def apply_case_to_progress(progress: Dict[str, Any], case_row: Dict[str, Any], rubrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Folds one newly saved case into a user's running aggregates (in place)."""
+    progress["case_count"] = progress.get("case_count", 0) + 1
+    rubric_stats = progress.setdefault("rubric_stats", {})
+    for rubric in rubrics:
+        score = rubric.get("score")
+        if isinstance(score, (int, float)):
+            _add_sample(rubric_stats, rubric["key"], float(score))
+    score = float(case_row["overall_score"])
+    _add_sample(progress.setdefault("track_stats", {}), case_row["track"], score)
+    _add_sample(progress.setdefault("type_stats", {}), case_row["type"], score)
+
+    recent = progress.setdefault("recent_scores", [])
+    recent.append({
+        "case_id": case_row["id"],
+        "completed_at": case_row["completed_at"],
+        "track": case_row["track"],
+        "type": case_row["type"],
+        "score": score,
+    })
+    recent.sort(key=lambda item: item["completed_at"])
+    del recent[:-RECENT_SCORE_WINDOW]
+    return progress
+
+
+def _is_unique_violation(exc: Exception) -> bool:
+    return getattr(exc, "code", None) == "23505"
+
+
+def _update_progress(supabase, user_id: str, case_row: Dict[str, Any], rubrics: List[Dict[str, Any]]) -> None:
+    """
+    Optimistic read-modify-write: the write only lands if `version` is unchanged since
+    the read (or, for a first case, if no row appeared meanwhile); otherwise re-read.
+    """
+    for _ in range(PROGRESS_WRITE_ATTEMPTS):
+        resp = (
+            supabase.table("user_progress")
+            .select(f"{PROGRESS_COLUMNS}, version")
+            .eq("user_id", user_id)
+            .limit(1)
+            .execute()
+        )
+        if resp.data:
+            progress = resp.data[0]
+            version = progress.pop("version")
+            apply_case_to_progress(progress, case_row, rubrics)
+            written = (
+                supabase.table("user_progress")
+                .update({**progress, "version": version + 1}, count="exact", returning="minimal")
+                .eq("user_id", user_id)
+                .eq("version", version)
+                .execute()
+            )
+            if written.count:
+                return
+            continue
+        progress = apply_case_to_progress(empty_progress(), case_row, rubrics)
+        try:
+            supabase.table("user_progress").insert({"user_id": user_id, **progress, "version": 1}, returning="minimal").execute()
+            return
+        except Exception as exc:
+            if not _is_unique_violation(exc):
+                raise
+    raise RuntimeError(f"user_progress for {user_id} kept changing; gave up after {PROGRESS_WRITE_ATTEMPTS} attempts")
+
+
+def get_progress(user_id: str) -> Dict[str, Any]:
+    supabase = get_supabase()
     if supabase is None:
         raise RuntimeError("Supabase not configured")
-    start = offset
-    end = offset + limit - 1
-    resp = (
+    resp = supabase.table("user_progress").select(PROGRESS_COLUMNS).eq("user_id", user_id).limit(1).execute()
+    return resp.data[0] if resp.data else empty_progress()
+
+
+def _update_score_sketches(supabase, samples: List[Tuple[str, float]]) -> None:
+    """
+    Adds the samples to their cohort histograms with the `increment_score_sketches`
+    RPC: the bins are bumped in place inside one transaction, so concurrent saves of
+    the same case type can't overwrite each other's counts.
+    """
+    if not samples:
+        return
+    deltas = Counter((key, ScoreSketch.bin_index(score)) for key, score in samples)
+    supabase.rpc(
+        "increment_score_sketches",
+        {"deltas": [{"key": key, "bin": idx, "n": n} for (key, idx), n in sorted(deltas.items())], "bins": BINS},
+    ).execute()
+
+
+def load_score_sketches() -> Dict[str, List[int]]:
+    supabase = get_supabase()
+    if supabase is None:
+        return {}
+    resp = supabase.table("score_sketches").select(SKETCH_COLUMNS).execute()
+    return {row["key"]: row["counts"] for row in resp.data or []}
+
+
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row["completed_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    # both values are spliced into an or_() filter string, so only a timestamp and a
+    # UUID (re-serialized from their parsed form) may come out of here
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        completed_at, case_id = json.loads(base64.urlsafe_b64decode(padded))
+        completed_at = datetime.fromisoformat(str(completed_at).replace("Z", "+00:00")).isoformat()
+        case_id = str(uuid.UUID(str(case_id)))
+    except (ValueError, TypeError, AttributeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    return completed_at, case_id
+
+
+def list_cases(user_id: str, limit: int = 10, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of case summaries, newest first. Returns (cases, next_cursor); the
+    cursor is None on the last page. `report_json` is left to `get_case_report`.
+    """
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Supabase not configured")
+    query = (
         supabase.table("cases")
-        .select("*, case_rubrics(*)")
+        .select(CASE_SUMMARY_COLUMNS)
         .eq("user_id", user_id)
-        .order("completed_at", desc=True)
-        .range(start, end)
+    )
+    if cursor:
+        completed_at, case_id = _decode_cursor(cursor)
+        # keyset on (completed_at, id) so equal timestamps never skip or repeat rows
+        query = query.or_(
+            f'completed_at.lt."{completed_at}",'
+            f'and(completed_at.eq."{completed_at}",id.lt."{case_id}")'
+        )
+    # one extra row tells us whether another page exists
+    resp = (
+        query.order("completed_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit + 1)
         .execute()
     )
+    rows = resp.data[:limit]
     cases = []
-    for row in resp.data:
+    for row in rows:
         rubrics = row.pop("case_rubrics", [])
         row["rubrics"] = rubrics
         cases.append(row)
-    has_more = len(resp.data) == limit
-    return cases, has_more
+    next_cursor = _encode_cursor(rows[-1]) if len(resp.data) > limit else None
+    return cases, next_cursor
 
 
 def get_case_report(user_id: str, case_id: str) -> Dict[str, Any]:
+    supabase = get_supabase()
     if supabase is None:
         raise RuntimeError("Supabase not configured")
     resp = (
@@ -111,3 +335,101 @@ def get_case_report(user_id: str, case_id: str) -> Dict[str, Any]:
     if not resp.data:
         raise ValueError("Case not found")
     return resp.data[0]["report_json"]
+
+
+def iter_regenerable_cases(
+    after_id: Optional[str] = None, page_size: int = 100, columns: str = REGEN_COLUMNS
+) -> Iterator[List[Dict[str, Any]]]:
+    """Pages of consulting cases that carry scoring inputs, in id order, starting after `after_id`."""
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Supabase not configured")
+    while True:
+        query = (
+            supabase.table("cases")
+            .select(columns)
+            .eq("track", "consulting")
+            .not_.is_("scoring_inputs", "null")
+            .order("id")
+            .limit(page_size)
+        )
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        rows = query.execute().data or []
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]["id"]
+
+
+def fetch_cases_by_id(case_ids: Sequence[str]) -> List[Dict[str, Any]]:
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Supabase not configured")
+    if not case_ids:
+        return []
+    return supabase.table("cases").select(REGEN_COLUMNS).in_("id", list(case_ids)).execute().data or []
+
+
+def write_regenerated_reports(results: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+    """
+    Bulk write-back of (case row, new report) pairs: one upsert for the cases, one for
+    their rubrics, and one delete for rubric keys the new reports no longer have.
+    user_progress aggregates are left as they are.
+    """
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Supabase not configured")
+    if not results:
+        return
+    case_rows = [{"id": row["id"], **_case_payload(row["user_id"], report)} for row, report in results]
+    supabase.table("cases").upsert(case_rows, on_conflict="id", returning="minimal").execute()
+
+    rubric_rows = [
+        _rubric_row(row["id"], row["user_id"], rubric)
+        for row, report in results
+        for rubric in report.get("rubrics", [])
+    ]
+    if rubric_rows:
+        supabase.table("case_rubrics").upsert(rubric_rows, on_conflict=RUBRIC_CONFLICT_KEY, returning="minimal").execute()
+    keys = sorted({rubric["key"] for _, report in results for rubric in report.get("rubrics", [])})
+    if keys:
+        (
+            supabase.table("case_rubrics")
+            .delete(returning="minimal")
+            .in_("case_id", [row["id"] for row, _ in results])
+            .not_.in_("key", keys)
+            .execute()
+        )
+
+
+def rebuild_score_sketches(page_size: int = 500) -> int:
+    """
+    Recounts every cohort histogram from the stored reports (backfill, or after
+    regeneration). The recount replaces the stored counts, so increments from cases
+    saved while it runs are lost; run it when no cases are being saved.
+    """
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Supabase not configured")
+    sketches: Dict[str, ScoreSketch] = {}
+    after_id, scanned = None, 0
+    while True:
+        query = supabase.table("cases").select("id, track, report_json").order("id").limit(page_size)
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        rows = query.execute().data or []
+        for row in rows:
+            report = row["report_json"] or {}
+            for key, score in report_samples(report, row.get("track") or _infer_track(report)):
+                sketches.setdefault(key, ScoreSketch()).add(score)
+        scanned += len(rows)
+        if len(rows) < page_size:
+            break
+        after_id = rows[-1]["id"]
+    rows = [{"key": key, "counts": sketch.counts} for key, sketch in sketches.items()]
+    for start in range(0, len(rows), page_size):
+        supabase.table("score_sketches").upsert(rows[start:start + page_size], on_conflict="key", returning="minimal").execute()
+    return scanned
@@ -124,13 +124,14 @@ Input:
 
 Instructions:
 - Use the provided numeric `score` values EXACTLY as given.
+- Write exactly one rubric per stage, in the given order, with "key" set to that stage's "id".
 - Produce JSON with this schema (all fields required):
 {
   "case": {"title": str, "productGroup": str, "industry": str, "completedAt": str, "durationSec": int},
   "overall": {"band": str, "executiveSummary": str},
   "rubrics": [
      {
-       "key": "...",
+       "key": "<stage id>",
        "title": "...",
        "score": number,
        "strengths": [{"text": "..."}, ...],
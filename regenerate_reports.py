@@ -0,0 +1,351 @@
+"""
+Batch regeneration of stored consulting reports.
+
+Run after changing REPORT_SYSTEM, DIMENSION_CONFIG / STAGE_DIMENSION_MAP or the band
+thresholds (controller.OVERALL_BANDS). Cases saved with `scoring_inputs` are streamed
+from Supabase in id order; dimension scores and the overall band are recomputed locally
+with the controller's own code, the report LLM calls go through a bounded thread pool
+(or the OpenAI Batch API, at lower cost and up to 24h latency), and results are written
+back a page at a time. Progress is checkpointed to a JSON file after every finished
+report, so an interrupted run resumes where it stopped:
+
+    python regenerate_reports.py --dry-run                 # what would change, no LLM calls
+    python regenerate_reports.py --workers 4
+    python regenerate_reports.py --mode batch --wait       # submit, poll, collect, repeat
+    python regenerate_reports.py --retry-failed
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from cohort_benchmarks import CohortBenchmarks
+from controller import (
+    DEFAULT_BAND,
+    OVERALL_BANDS,
+    SCORING_INPUTS_VERSION,
+    InterviewController,
+    finish_report,
+    session_from_scoring_inputs,
+)
+from llm_client import LLMCallPolicy, LLMClient, dumps_payload, lazy_openai_client
+from persistence import fetch_cases_by_id, iter_regenerable_cases, load_score_sketches, write_regenerated_reports
+from prompts import REPORT_SYSTEM
+from rubrics import DIMENSION_CONFIG, DIMENSION_ORDER, STAGE_DIMENSION_MAP
+from schemas import CasePerformanceReport
+
+DEFAULT_CHECKPOINT = "regenerate_reports.checkpoint.json"
+BATCH_ACTIVE_STATES = {"validating", "in_progress", "finalizing", "cancelling"}
+ID_CHUNK = 100  # ids per `in.(...)` lookup, keeps request URLs short
+
+
+def config_fingerprint() -> str:
+    """Identifies the scoring/report config a checkpoint was written under."""
+    config = {
+        "report_system": REPORT_SYSTEM,
+        "dimensions": DIMENSION_CONFIG,
+        "order": DIMENSION_ORDER,
+        "stage_map": STAGE_DIMENSION_MAP,
+        "bands": [list(b) for b in OVERALL_BANDS] + [DEFAULT_BAND],
+    }
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class Checkpoint:
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.state: Dict[str, Any] = {
+            "fingerprint": fingerprint,
+            "cursor": None,  # last case id whose page has been written back (or submitted, in batch mode)
+            "results": {},  # case id -> regenerated report not yet written back
+            "failed": {},  # case id -> error
+            "written": 0,
+            "batch": None,  # {"id", "case_ids"} of the in-flight Batch API job
+        }
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str, restart: bool = False) -> "Checkpoint":
+        checkpoint = cls(path, fingerprint)
+        if restart or not os.path.exists(path):
+            return checkpoint
+        with open(path, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+        if state.get("fingerprint") != fingerprint:
+            raise ValueError(
+                f"Checkpoint {path} was written for a different report/rubric/band config; "
+                "pass --restart to regenerate from the beginning."
+            )
+        checkpoint.state.update(state)
+        return checkpoint
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.state, fh)
+        os.replace(tmp_path, self.path)
+
+
+def _session_and_meta(row: Dict[str, Any]):
+    inputs = row["scoring_inputs"]
+    if (inputs.get("version") or 0) > SCORING_INPUTS_VERSION:
+        raise ValueError(f"scoring_inputs version {inputs.get('version')} is newer than supported.")
+    return session_from_scoring_inputs(row["id"], inputs), row["report_json"]["case"]
+
+
+def regenerate_one(controller: InterviewController, row: Dict[str, Any]) -> Dict[str, Any]:
+    session, case_meta = _session_and_meta(row)
+    return controller.annotate_report(controller.build_report(session, case_meta))
+
+
+def report_from_text(controller: InterviewController, row: Dict[str, Any], text: str) -> Dict[str, Any]:
+    session, case_meta = _session_and_meta(row)
+    _, band = controller.report_request(session, case_meta)
+    report = finish_report(CasePerformanceReport.model_validate(json.loads(text)), case_meta, band)
+    return controller.annotate_report(report)
+
+
+def _stream_rows(after_id: Optional[str], page_size: int) -> Iterator[Dict[str, Any]]:
+    for rows in iter_regenerable_cases(after_id=after_id, page_size=page_size):
+        yield from rows
+
+
+def _fetch_rows(case_ids: List[str]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for start in range(0, len(case_ids), ID_CHUNK):
+        rows.extend(fetch_cases_by_id(case_ids[start:start + ID_CHUNK]))
+    return rows
+
+
+def _write_back(checkpoint: Checkpoint, done: List[Tuple[Dict[str, Any], Dict[str, Any]]], page_size: int) -> None:
+    for start in range(0, len(done), page_size):
+        write_regenerated_reports(done[start:start + page_size])
+    checkpoint.state["written"] += len(done)
+
+
+# ---- dry run ----
+def dry_run(controller: InterviewController, page_size: int, limit: Optional[int]) -> Dict[str, int]:
+    counts = {"cases": 0, "band_changed": 0, "scores_changed": 0, "unreadable": 0}
+    for row in itertools.islice(_stream_rows(None, page_size), limit):
+        counts["cases"] += 1
+        try:
+            session, case_meta = _session_and_meta(row)
+            payload, band = controller.report_request(session, case_meta)
+        except (KeyError, TypeError, ValueError):
+            counts["unreadable"] += 1
+            continue
+        old = row["report_json"]
+        if band != (old.get("overall") or {}).get("band"):
+            counts["band_changed"] += 1
+        old_scores = {r.get("key"): r.get("score") for r in old.get("rubrics") or []}
+        if old_scores != {d["key"]: d["score"] for d in payload["dimensions"]}:
+            counts["scores_changed"] += 1
+    return counts
+
+
+# ---- bounded thread pool ----
+def _run_rows(controller, checkpoint: Checkpoint, pool: ThreadPoolExecutor, rows: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    results = checkpoint.state["results"]
+    failed = checkpoint.state["failed"]
+    futures = {pool.submit(regenerate_one, controller, row): row for row in rows if row["id"] not in results}
+    for fut in as_completed(futures):
+        row = futures[fut]
+        try:
+            results[row["id"]] = fut.result()
+            failed.pop(row["id"], None)
+        except Exception as exc:
+            failed[row["id"]] = f"{type(exc).__name__}: {exc}"
+            print(f"⚠️  Report regeneration failed for case {row['id']}: {exc}")
+        checkpoint.save()
+    return [(row, results[row["id"]]) for row in rows if row["id"] in results]
+
+
+def run_pool(controller, checkpoint: Checkpoint, *, workers: int, page_size: int, limit: Optional[int]) -> None:
+    state = checkpoint.state
+    processed = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="regen") as pool:
+        for rows in iter_regenerable_cases(after_id=state["cursor"], page_size=page_size):
+            if limit is not None:
+                rows = rows[: limit - processed]
+            if not rows:
+                break
+            done = _run_rows(controller, checkpoint, pool, rows)
+            _write_back(checkpoint, done, page_size)
+            state["cursor"] = rows[-1]["id"]
+            state["results"] = {}
+            checkpoint.save()
+            processed += len(rows)
+            print(f"✅ {state['written']} reports written, {len(state['failed'])} failed (cursor {state['cursor']})")
+            if limit is not None and processed >= limit:
+                break
+
+
+def retry_failed(controller, checkpoint: Checkpoint, *, workers: int, page_size: int) -> None:
+    state = checkpoint.state
+    rows = _fetch_rows(sorted(state["failed"]))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="regen") as pool:
+        for start in range(0, len(rows), page_size):
+            done = _run_rows(controller, checkpoint, pool, rows[start:start + page_size])
+            _write_back(checkpoint, done, page_size)
+            for row, _ in done:
+                state["results"].pop(row["id"], None)
+            checkpoint.save()
+    print(f"✅ {state['written']} reports written, {len(state['failed'])} still failing")
+
+
+# ---- OpenAI Batch API ----
+def _response_text(body: Dict[str, Any]) -> str:
+    parts = [
+        content.get("text", "")
+        for item in body.get("output") or []
+        for content in item.get("content") or []
+        if content.get("type") == "output_text"
+    ]
+    return "".join(parts).strip()
+
+
+def _collect_batch(controller, checkpoint: Checkpoint, client, *, page_size: int) -> bool:
+    """Returns True once the in-flight batch (if any) has been collected."""
+    state = checkpoint.state
+    batch = state["batch"]
+    if not batch:
+        return True
+    info = client.batches.retrieve(batch["id"])
+    if info.status in BATCH_ACTIVE_STATES:
+        counts = getattr(info, "request_counts", None)
+        progress = f" ({counts.completed}/{counts.total})" if counts is not None else ""
+        print(f"⏳ Batch {batch['id']} is {info.status}{progress}")
+        return False
+
+    outputs: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    for file_id in (info.output_file_id, getattr(info, "error_file_id", None)):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                errors[record["custom_id"]] = json.dumps(record.get("error") or response.get("body"))[:500]
+            else:
+                outputs[record["custom_id"]] = _response_text(response.get("body") or {})
+
+    done = []
+    for row in _fetch_rows(batch["case_ids"]):
+        text = outputs.get(row["id"])
+        if text is None:
+            state["failed"][row["id"]] = errors.get(row["id"], f"batch {info.status} without output")
+            continue
+        try:
+            done.append((row, report_from_text(controller, row, text)))
+            state["failed"].pop(row["id"], None)
+        except Exception as exc:
+            state["failed"][row["id"]] = f"{type(exc).__name__}: {exc}"
+    _write_back(checkpoint, done, page_size)
+    state["batch"] = None
+    checkpoint.save()
+    print(f"✅ Batch {batch['id']} ({info.status}): {len(done)} written, {len(state['failed'])} failed in total")
+    return True
+
+
+def _submit_batch(controller, checkpoint: Checkpoint, client, *, model: str, page_size: int, max_requests: int) -> bool:
+    """Submits the next slice of cases; returns False when nothing is left."""
+    state = checkpoint.state
+    lines, case_ids = [], []
+    for row in itertools.islice(_stream_rows(state["cursor"], page_size), max_requests):
+        try:
+            session, case_meta = _session_and_meta(row)
+            payload, _ = controller.report_request(session, case_meta)
+        except (KeyError, TypeError, ValueError) as exc:
+            state["failed"][row["id"]] = f"{type(exc).__name__}: {exc}"
+            continue
+        body = {
+            "model": model,
+            "input": [
+                {"role": "system", "content": REPORT_SYSTEM},
+                {"role": "user", "content": dumps_payload(payload)},
+            ],
+        }
+        lines.append(json.dumps({"custom_id": row["id"], "method": "POST", "url": "/v1/responses", "body": body}))
+        case_ids.append(row["id"])
+    if not case_ids:
+        checkpoint.save()
+        return False
+    upload = client.files.create(file=("regenerate_reports.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+    created = client.batches.create(input_file_id=upload.id, endpoint="/v1/responses", completion_window="24h")
+    state["batch"] = {"id": created.id, "case_ids": case_ids}
+    state["cursor"] = case_ids[-1]
+    checkpoint.save()
+    print(f"📤 Submitted batch {created.id} with {len(case_ids)} reports")
+    return True
+
+
+def run_batch(controller, checkpoint: Checkpoint, client, *, model: str, page_size: int, max_requests: int, wait: bool, poll_s: float) -> None:
+    while True:
+        if _collect_batch(controller, checkpoint, client, page_size=page_size):
+            if not _submit_batch(controller, checkpoint, client, model=model, page_size=page_size, max_requests=max_requests):
+                print(f"✅ Nothing left to submit; {checkpoint.state['written']} reports written in total")
+                return
+        if not wait:
+            print(f"Re-run to poll; progress is saved in {checkpoint.path}")
+            return
+        time.sleep(poll_s)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Regenerate stored consulting reports.")
+    parser.add_argument("--mode", choices=["pool", "batch"], default="pool")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("REGEN_WORKERS", "4")), help="concurrent report calls (pool mode)")
+    parser.add_argument("--page-size", type=int, default=50, help="cases per Supabase page / bulk write")
+    parser.add_argument("--limit", type=int, help="stop after this many cases (pool mode and --dry-run)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="recompute scores and bands only; no LLM calls or writes")
+    parser.add_argument("--retry-failed", action="store_true", help="regenerate the cases the checkpoint lists as failed")
+    parser.add_argument("--batch-max-requests", type=int, default=2000, help="reports per Batch API job")
+    parser.add_argument("--wait", action="store_true", help="batch mode: keep polling until everything is collected")
+    parser.add_argument("--poll-s", type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    model = os.getenv("MODEL", "gpt-4.1")
+    client = lazy_openai_client()
+    llm = LLMClient(client=client, model=model, fallback_model=os.getenv("FALLBACK_MODEL"), policy=LLMCallPolicy.from_env())
+    # only the scoring/report half of the controller is used; no cases are generated
+    controller = InterviewController(
+        case_store=None,
+        llm_client=llm,
+        case_generator_fn=None,
+        benchmarks=CohortBenchmarks.from_env(load_score_sketches),
+    )
+
+    if args.dry_run:
+        print(json.dumps(dry_run(controller, args.page_size, args.limit), indent=2))
+        return 0
+
+    try:
+        checkpoint = Checkpoint.load(args.checkpoint, config_fingerprint(), restart=args.restart)
+    except ValueError as exc:
+        print(f"⚠️  {exc}")
+        return 2
+
+    if args.retry_failed:
+        retry_failed(controller, checkpoint, workers=args.workers, page_size=args.page_size)
+    elif args.mode == "batch":
+        run_batch(
+            controller, checkpoint, client,
+            model=model, page_size=args.page_size, max_requests=args.batch_max_requests,
+            wait=args.wait, poll_s=args.poll_s,
+        )
+    else:
+        run_pool(controller, checkpoint, workers=args.workers, page_size=args.page_size, limit=args.limit)
+    return 1 if checkpoint.state["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
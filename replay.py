@@ -0,0 +1,437 @@
+"""
+Offline, deterministic replay of recorded interview sessions.
+
+`TranscriptRecorder` (enabled in web_server with REPLAY_RECORD_DIR) saves one JSON file
+per session holding every student utterance, the raw model output of each LLM call
+that turn triggered, and the turn's non-LLM choices that depend on process state: IB
+guide entries (picked at random) and hits in the process-wide EvalCache. `replay()`
+drives a fresh `InterviewController` or `IBInterviewSession` through the same turns
+with a stand-in client whose `responses.create` answers from the recording, and forces
+the same entry picks and cache hits, so payload building, JSON parsing and validation
+and all controller logic run as in production, minus the network. Each turn
+is timed, interviewer output is checked against the recording, and the run can be
+profiled:
+
+    python replay.py recordings/consulting-<id>.json --profile replay.prof
+    python replay.py recordings/*.json --profiler pyinstrument --profile replay.html
+
+Exit status is 1 when any turn diverges, so recordings double as regression fixtures.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+RECORDING_VERSION = 2
+FLOW_CONSULTING = "consulting"
+FLOW_IB = "ib"
+
+
+# ---- recording (live server) ----
+class TranscriptRecorder:
+    """Captures per-turn LLM outputs through `LLMClient.output_hooks`; one live recording per flow."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._local = threading.local()
+        self._recordings: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["TranscriptRecorder"]:
+        root = os.getenv("REPLAY_RECORD_DIR")
+        return cls(root) if root else None
+
+    def attach(self, llm_client) -> None:
+        llm_client.output_hooks.append(self._capture)
+
+    def attach_eval_cache(self, eval_cache) -> None:
+        eval_cache.hit_hooks.append(self._capture_cache_hit)
+
+    def attach_ib(self, ib_session) -> None:
+        ib_session.entry_hooks.append(self._capture_entry)
+
+    def _current(self) -> Optional[Dict[str, Any]]:
+        return getattr(self._local, "record", None)
+
+    def _capture(self, text: str) -> None:
+        record = self._current()
+        if record is not None:
+            record["llm"].append(text)
+
+    def _capture_cache_hit(self, key, result: Dict[str, Any]) -> None:
+        record = self._current()
+        if record is not None:
+            record["cache_hits"].append({"key": list(key), "result": result})
+
+    def _capture_entry(self, stage_id: str, entry_key: str) -> None:
+        record = self._current()
+        if record is not None:
+            record["entries"].append([stage_id, entry_key])
+
+    def begin(self, flow: str, session_id: str, params: Dict[str, Any]) -> None:
+        with self._lock:
+            self._recordings[flow] = {
+                "version": RECORDING_VERSION,
+                "flow": flow,
+                "session_id": session_id,
+                "params": params,
+                "turns": [],
+            }
+
+    @contextlib.contextmanager
+    def turn(self, flow: str, student: Optional[str] = None):
+        """
+        Wraps one start/step call; the caller fills `record["interviewer"]` with the
+        utterances it sent back. A turn that raises is kept (flagged) so replay expects it too.
+        """
+        record: Dict[str, Any] = {"student": student, "llm": [], "cache_hits": [], "entries": [], "interviewer": []}
+        self._local.record = record
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as exc:
+            record["error"] = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            self._local.record = None
+            record["wall_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            with self._lock:
+                recording = self._recordings.get(flow)
+                if recording is not None:
+                    recording["turns"].append(record)
+                    self._write(recording)
+
+    def _write(self, recording: Dict[str, Any]) -> None:
+        path = os.path.join(self.root, f"{recording['flow']}-{recording['session_id']}.json")
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(recording, fh, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            print(f"⚠️  Could not write replay recording: {exc}")
+
+
+# ---- replay (offline) ----
+class ReplayDivergence(RuntimeError):
+    pass
+
+
+class ReplayClient:
+    """Stands in for the OpenAI client: `responses.create` returns the next recorded output."""
+
+    def __init__(self):
+        self.responses = self
+        self._outputs: "deque[str]" = deque()
+
+    def load(self, outputs: List[str]) -> None:
+        self._outputs = deque(outputs)
+
+    def remaining(self) -> int:
+        return len(self._outputs)
+
+    def create(self, **_kwargs) -> SimpleNamespace:
+        if not self._outputs:
+            raise ReplayDivergence("More LLM calls than were recorded for this turn.")
+        return SimpleNamespace(output_text=self._outputs.popleft())
+
+
+class RecordedChoices:
+    """A turn's recorded IB entry picks and EvalCache hits, handed back in order."""
+
+    def __init__(self):
+        self.entries: "deque[List[str]]" = deque()
+        self.cache_hits: "deque[Dict[str, Any]]" = deque()
+
+    def load(self, turn: Dict[str, Any]) -> None:
+        self.entries = deque(turn.get("entries") or [])
+        self.cache_hits = deque(turn.get("cache_hits") or [])
+
+    def remaining(self) -> int:
+        return len(self.entries) + len(self.cache_hits)
+
+    def pick_entry(self, entries: List[Dict], used: set) -> Dict:
+        from ib_session import _entry_key
+
+        if not self.entries:
+            raise ReplayDivergence("More IB guide picks than were recorded for this turn.")
+        _, key = self.entries.popleft()
+        for entry in entries:
+            if _entry_key(entry) == key and key not in used:
+                return entry
+        raise ReplayDivergence(f"Recorded guide entry {key!r} is not available (guide changed?).")
+
+    def cache_hit(self, key) -> Optional[Dict[str, Any]]:
+        if self.cache_hits and self.cache_hits[0]["key"] == list(key):
+            return self.cache_hits.popleft()["result"]
+        return None
+
+
+def _replay_eval_cache(choices: RecordedChoices):
+    from eval_cache import EvalCache
+    from schemas import LLMStageEvaluation
+
+    class ReplayEvalCache(EvalCache):
+        """Hits exactly where the live process-wide cache hit; never learns from this replay."""
+
+        def get(self, stage_id, text, substep):
+            data = choices.cache_hit(self.key(stage_id, text, substep))
+            if data is None:
+                return None
+            self.stats["cache_hits"] += 1
+            return LLMStageEvaluation.model_validate(data)
+
+        def put(self, *_args) -> None:
+            return None
+
+    return ReplayEvalCache()
+
+
+@dataclass
+class TurnResult:
+    index: int
+    student: Optional[str]
+    wall_ms: float
+    recorded_wall_ms: Optional[float]
+    llm_calls: int
+    matched: bool
+    error: Optional[str] = None
+    unused_outputs: int = 0  # recorded outputs the replay never asked for
+    unused_choices: int = 0  # recorded entry picks / cache hits the replay never used
+    expected: List[str] = field(default_factory=list)
+    actual: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ReplayResult:
+    path: Optional[str]
+    flow: str
+    turns: List[TurnResult]
+
+    @property
+    def total_ms(self) -> float:
+        return round(sum(t.wall_ms for t in self.turns), 2)
+
+    @property
+    def diverged(self) -> List[TurnResult]:
+        return [t for t in self.turns if not t.matched]
+
+
+def load_recording(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as fh:
+        recording = json.load(fh)
+    version = recording.get("version")
+    if version != RECORDING_VERSION:
+        # v1 lacked entry picks and cache hits, so it could not replay faithfully; re-record
+        raise ValueError(f"Unsupported recording version {version!r} in {path}.")
+    return recording
+
+
+def _replay_llm(client: ReplayClient):
+    from llm_client import LLMCallPolicy, LLMClient
+
+    # no retries or hedging: each recorded output must be consumed by exactly one call
+    policy = LLMCallPolicy(max_retries=0, hedge_enabled=False)
+    return LLMClient(client=client, model=os.getenv("MODEL", "gpt-4.1"), policy=policy)
+
+
+def _consulting_runner(params: Dict[str, Any], llm, choices: RecordedChoices) -> Callable[[Optional[str]], List[str]]:
+    from case_generator import generate_case
+    from case_store import CaseStore
+    from controller import InterviewController, Session
+
+    # same generator call as web_server, minus chart prerendering (a web-only concern)
+    controller = InterviewController(
+        case_store=CaseStore(spill_dir=None),
+        llm_client=llm,
+        case_generator_fn=lambda **p: generate_case(llm, case_type=p.get("case_type") or "Profitability"),
+        eval_cache=_replay_eval_cache(choices),
+    )
+    session = Session(case_id="replay_case")
+    if params.get("case_type"):
+        session.case_params["case_type"] = params["case_type"]
+    session.selected_firm = params.get("firm")
+
+    def run_turn(student: Optional[str]) -> List[str]:
+        first = controller.start(session) if student is None else controller.step(session, student)
+        turns = [t for t in [first, *controller.flush_pending_outputs(session)] if t]
+        return [t.get("next_utterance") for t in turns]
+
+    return run_turn
+
+
+def _ib_runner(params: Dict[str, Any], llm, choices: RecordedChoices) -> Callable[[Optional[str]], List[str]]:
+    from ib_session import DEFAULT_ACCOUNTING, DEFAULT_VALUATION, IBInterviewSession
+
+    session = IBInterviewSession(
+        llm_client=llm,
+        product_group=params["product_group"],
+        industry_group=params["industry_group"],
+        accounting_guide=params.get("accounting_guide", DEFAULT_ACCOUNTING),
+        valuation_guide=params.get("valuation_guide", DEFAULT_VALUATION),
+    )
+    session.entry_picker = choices.pick_entry
+
+    def run_turn(student: Optional[str]) -> List[str]:
+        if student is None:
+            return [session.start()]
+        reply, done = session.step(student)
+        if done:
+            session.get_report()
+        return [reply]
+
+    return run_turn
+
+
+RUNNERS = {FLOW_CONSULTING: _consulting_runner, FLOW_IB: _ib_runner}
+
+
+def replay(recording: Dict[str, Any], *, profiler=None, quiet: bool = True, path: Optional[str] = None) -> ReplayResult:
+    """
+    Re-drives one recording. `profiler` is anything with enable()/disable() (e.g. a
+    cProfile.Profile) and is only active inside start/step, so setup and the replay
+    bookkeeping stay out of the profile. `quiet` discards the LLM client's debug prints.
+    """
+    flow = recording["flow"]
+    if flow not in RUNNERS:
+        raise ValueError(f"Unknown flow '{flow}'.")
+    client = ReplayClient()
+    choices = RecordedChoices()
+    llm = _replay_llm(client)
+    results: List[TurnResult] = []
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        run_turn = RUNNERS[flow](recording.get("params") or {}, llm, choices)
+        for index, turn in enumerate(recording["turns"]):
+            outputs = turn.get("llm") or []
+            client.load(outputs)
+            choices.load(turn)
+            error = None
+            actual: List[str] = []
+            started = time.perf_counter()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                actual = run_turn(turn.get("student"))
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+            wall_ms = round((time.perf_counter() - started) * 1000, 2)
+            expected = turn.get("interviewer") or []
+            matched = (
+                bool(error) == bool(turn.get("error"))
+                and client.remaining() == 0
+                and choices.remaining() == 0
+                and (error is not None or actual == expected)
+            )
+            results.append(
+                TurnResult(
+                    index=index,
+                    student=turn.get("student"),
+                    wall_ms=wall_ms,
+                    recorded_wall_ms=turn.get("wall_ms"),
+                    llm_calls=len(outputs) - client.remaining(),
+                    matched=matched,
+                    error=error,
+                    unused_outputs=client.remaining(),
+                    unused_choices=choices.remaining(),
+                    expected=expected,
+                    actual=actual,
+                )
+            )
+    return ReplayResult(path=path, flow=flow, turns=results)
+
+
+class _PyinstrumentAdapter:
+    """enable()/disable() over pyinstrument, whose later start() calls extend the same session."""
+
+    def __init__(self):
+        from pyinstrument import Profiler  # type: ignore
+
+        self.profiler = Profiler()
+
+    def enable(self) -> None:
+        self.profiler.start()
+
+    def disable(self) -> None:
+        self.profiler.stop()
+
+
+def _print_result(result: ReplayResult) -> None:
+    print(f"\n{result.path or '<recording>'} [{result.flow}] {len(result.turns)} turns, {result.total_ms} ms replayed")
+    print(f"{'turn':>4} {'replay ms':>10} {'recorded ms':>12} {'llm':>4}  status")
+    for t in result.turns:
+        recorded = "-" if t.recorded_wall_ms is None else f"{t.recorded_wall_ms:.1f}"
+        status = "ok" if t.matched else f"DIVERGED{': ' + t.error if t.error else ''}"
+        print(f"{t.index:>4} {t.wall_ms:>10.2f} {recorded:>12} {t.llm_calls:>4}  {status}")
+        if t.unused_outputs:
+            print(f"       {t.unused_outputs} recorded LLM output(s) left unused")
+        if t.unused_choices:
+            print(f"       {t.unused_choices} recorded guide pick(s)/cache hit(s) left unused")
+        if not t.matched and not t.error and t.actual != t.expected:
+            print(f"       expected: {t.expected!r}\n       actual:   {t.actual!r}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded interview sessions offline.")
+    parser.add_argument("recordings", nargs="+", help="recording JSON files written via REPLAY_RECORD_DIR")
+    parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile")
+    parser.add_argument("--profile", help="write the profile here (.prof for cProfile; .html/.txt for pyinstrument)")
+    parser.add_argument("--top", type=int, default=25, help="cProfile rows to print (0 to skip)")
+    parser.add_argument("--verbose", action="store_true", help="keep the LLM client's debug output")
+    parser.add_argument("--json", action="store_true", help="print per-turn results as JSON")
+    args = parser.parse_args(argv)
+
+    profiler = None
+    if args.profiler == "pyinstrument":
+        try:
+            profiler = _PyinstrumentAdapter()
+        except ImportError:
+            print("⚠️  pyinstrument is not installed; falling back to cProfile.")
+    if profiler is None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+    results = [
+        replay(load_recording(path), profiler=profiler, quiet=not args.verbose, path=path)
+        for path in args.recordings
+    ]
+
+    if args.json:
+        print(json.dumps([{"path": r.path, "flow": r.flow, "total_ms": r.total_ms, "turns": [asdict(t) for t in r.turns]} for r in results], indent=2))
+    else:
+        for result in results:
+            _print_result(result)
+
+    if isinstance(profiler, _PyinstrumentAdapter):
+        if args.profile:
+            with open(args.profile, "w", encoding="utf-8") as fh:
+                fh.write(profiler.profiler.output_html() if args.profile.endswith(".html") else profiler.profiler.output_text())
+        elif not args.json:
+            print(profiler.profiler.output_text())
+    else:
+        import pstats
+
+        if args.profile:
+            profiler.dump_stats(args.profile)
+        if args.top and not args.json:
+            pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(args.top)
+
+    return 1 if any(r.diverged for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
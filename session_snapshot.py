@@ -0,0 +1,127 @@
+"""
+Versioned snapshots of live interview state.
+
+A snapshot is a small header (magic, format version, codec) followed by the state
+encoded with msgpack (or JSON when msgpack isn't installed) and zlib-compressed. Events
+are stored as positional rows and IB guide entries as guide path + index, so the
+blob stays compact and restores without re-reading any LLM output.
+"""
+import json
+import os
+import zlib
+from dataclasses import fields
+from typing import Any, Dict, Optional
+
+from controller import Event, Session
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None  # type: ignore
+
+MAGIC = b"MSS"
+SNAPSHOT_VERSION = 1
+CODEC_MSGPACK = 1
+CODEC_JSON = 2
+ZLIB_LEVEL = 6
+
+KIND_CONSULTING = "consulting"
+KIND_IB = "ib"
+
+_SESSION_FIELDS = [f.name for f in fields(Session) if f.name != "events"]
+
+
+def session_to_dict(session: Session, case_obj: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    data = {name: getattr(session, name) for name in _SESSION_FIELDS}
+    data["case_generated"] = getattr(session, "case_generated", False)
+    # the generated case travels with the session so a restore never regenerates it
+    data["case"] = case_obj
+    # [role, stage_id, text, ts_ms, meta]; meta is None when empty
+    data["events"] = [[e.role, e.stage_id, e.text, e.ts_ms, dict(e.meta) or None] for e in session.events]
+    return data
+
+
+def session_from_dict(data: Dict[str, Any]) -> Session:
+    session = Session(**{name: data[name] for name in _SESSION_FIELDS if name in data})
+    session.events = [
+        Event(role=role, stage_id=stage_id, text=text, ts_ms=ts_ms, meta=meta or {})
+        for role, stage_id, text, ts_ms, meta in data.get("events", [])
+    ]
+    if data.get("case_generated"):
+        session.case_generated = True
+    return session
+
+
+def encode(kind: str, state: Dict[str, Any]) -> bytes:
+    body = {"kind": kind, "state": state}
+    if msgpack is not None:
+        codec, raw = CODEC_MSGPACK, msgpack.packb(body, use_bin_type=True)
+    else:
+        codec, raw = CODEC_JSON, json.dumps(body, separators=(",", ":")).encode("utf-8")
+    return MAGIC + bytes([SNAPSHOT_VERSION, codec]) + zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decode(blob: bytes) -> Dict[str, Any]:
+    if blob[:3] != MAGIC or len(blob) < 5:
+        raise ValueError("Not a session snapshot.")
+    version, codec = blob[3], blob[4]
+    if version > SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {version} is newer than supported ({SNAPSHOT_VERSION}).")
+    raw = zlib.decompress(blob[5:])
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("msgpack is required to read this snapshot.")
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+    if codec == CODEC_JSON:
+        return json.loads(raw)
+    raise ValueError(f"Unknown snapshot codec {codec}.")
+
+
+def snapshot_session(session: Session, case_store=None) -> bytes:
+    case_obj = None
+    if case_store is not None and getattr(session, "case_generated", False):
+        try:
+            case_obj = case_store.load_case(session.case_id)
+        except KeyError:
+            pass
+    return encode(KIND_CONSULTING, session_to_dict(session, case_obj))
+
+
+def snapshot_ib_session(ib_session) -> bytes:
+    return encode(KIND_IB, ib_session.to_snapshot())
+
+
+def restore(blob: bytes, *, llm_client=None, case_store=None, benchmarks=None):
+    """
+    Returns a `Session` or `IBInterviewSession`, depending on what was snapshotted.
+    A consulting snapshot's case is put back into `case_store` when one is given.
+    """
+    body = decode(blob)
+    if body["kind"] == KIND_CONSULTING:
+        state = body["state"]
+        session = session_from_dict(state)
+        if state.get("case") is not None and case_store is not None:
+            case_store.put_case(session.case_id, state["case"])
+        elif state.get("case") is None:
+            session.case_generated = False
+        return session
+    if body["kind"] == KIND_IB:
+        from ib_session import IBInterviewSession
+
+        return IBInterviewSession.from_snapshot(body["state"], llm_client=llm_client, benchmarks=benchmarks)
+    raise ValueError(f"Unknown snapshot kind '{body['kind']}'.")
+
+
+def write_snapshot(path: str, blob: bytes) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(blob)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as fh:
+            return fh.read()
+    except FileNotFoundError:
+        return None
@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass
 from typing import List, Optional
 from rubrics import (
@@ -21,6 +22,7 @@ class StageConfig:
     interviewer_persona: str
     guidance: str
     max_interviewer_turns: Optional[int] = None
+    max_clarify_rounds: Optional[int] = None
 
 STAGES = [
     StageConfig(
@@ -33,6 +35,7 @@ STAGES = [
         interviewer_name="Jordan (Case Opener)",
         interviewer_persona="Warm yet efficient engagement manager focused on framing the client situation and clarifying scope.",
         guidance="Read the background, then ask whether the candidate has clarifying questions. Answer any clarifying questions briefly. When you answer a clarifying question, ask if the user has any more questions. Only end the stage once the candidate says they have no more clarifying questions.",
+        max_clarify_rounds=int(os.getenv("MAX_CLARIFY_ROUNDS", "5")),
     ),
     StageConfig(
         id="structuring",
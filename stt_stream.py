@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+TranscribeFn = Callable[[bytes, str, Optional[str]], str]
+
+
+def upload_from_bytes(data: bytes, filename: str, mimetype: Optional[str] = None) -> Tuple[str, bytes, str]:
+    """Shape raw upload bytes as the (name, content, type) tuple the OpenAI SDK accepts."""
+    return (filename, data, mimetype or "application/octet-stream")
+
+
+class ChunkedTranscriptionStore:
+    """
+    Reassembles streamed speech segments per recording stream.
+
+    Each uploaded segment is a self-contained audio file (the browser rotates its
+    MediaRecorder), so it is transcribed in the background as soon as it lands.
+    `finalize` then only waits on the tail segment and joins the texts in order.
+    """
+
+    def __init__(self, transcribe_fn: TranscribeFn, *, ttl_s: float = 300.0, max_workers: int = 4):
+        self.transcribe_fn = transcribe_fn
+        self.ttl_s = ttl_s
+        self._streams: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stt-chunk")
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_s
+        for stream_id in [sid for sid, s in self._streams.items() if s["touched"] < cutoff]:
+            self._streams.pop(stream_id, None)
+
+    def add_segment(self, stream_id: str, seq: int, data: bytes, filename: str, mimetype: Optional[str]) -> str:
+        """Queue a segment for transcription and return the partial transcript so far."""
+        future: Future = self._pool.submit(self.transcribe_fn, data, filename, mimetype)
+        with self._lock:
+            self._expire()
+            stream = self._streams.setdefault(stream_id, {"segments": {}, "touched": time.monotonic()})
+            stream["segments"][seq] = future
+            stream["touched"] = time.monotonic()
+        return self.partial(stream_id)
+
+    def partial(self, stream_id: str) -> str:
+        with self._lock:
+            stream = self._streams.get(stream_id)
+            segments = dict(stream["segments"]) if stream else {}
+        texts = []
+        for seq in sorted(segments):
+            future = segments[seq]
+            if not future.done():
+                break
+            if future.exception() is None and future.result():
+                texts.append(future.result())
+        return " ".join(texts)
+
+    def finalize(self, stream_id: str, expected_segments: int, timeout_s: float = 60.0) -> str:
+        with self._lock:
+            stream = self._streams.pop(stream_id, None)
+        if stream is None:
+            raise KeyError(f"Unknown transcription stream '{stream_id}'.")
+        segments = stream["segments"]
+        missing = [seq for seq in range(expected_segments) if seq not in segments]
+        if missing:
+            raise ValueError(f"Missing audio segments: {missing}")
+        texts = []
+        for seq in sorted(segments):
+            text = segments[seq].result(timeout=timeout_s)
+            if text:
+                texts.append(text)
+        return " ".join(texts)
@@ -1,11 +1,22 @@
 import os
+from typing import Any, Optional
 
-from supabase import create_client
+_client: Optional[Any] = None
+_initialized = False
 
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+def get_supabase():
+    """
+    Returns the shared Supabase client, or None when it is not configured.
+    The SDK is imported and the client built on first use, not at import time.
+    """
+    global _client, _initialized
+    if not _initialized:
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        if url and key:
+            from supabase import create_client
 
-supabase = None
-if SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+            _client = create_client(url, key)
+        _initialized = True
+    return _client
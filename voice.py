@@ -1,15 +1,13 @@
-import os
-import shutil
-import tempfile
-import platform
-import subprocess
+import queue
 import threading
-import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Iterator, List, Optional, Set
 
 from openai import OpenAI
 
+from audio_preprocess import TARGET_SAMPLE_RATE, prepare_for_stt
+
 try:
     import sounddevice as sd  # type: ignore
     import numpy as np  # type: ignore
@@ -27,6 +25,10 @@ class VoiceInterface:
     def listen(self, prompt: str = "Speak now...") -> str:
         raise NotImplementedError
 
+    def wait_until_done(self) -> None:
+        """Block until any in-flight playback has finished."""
+        return None
+
 
 @dataclass
 class OpenAIVoiceConfig:
@@ -38,63 +40,375 @@ class OpenAIVoiceConfig:
     silence_threshold: float = 0.01
     silence_duration: float = 1.0
     max_retries: int = 2
+    streaming_stt: bool = True
+    min_segment_seconds: float = 3.0
+    max_segment_seconds: float = 8.0
+    tts_sample_rate: int = 24000  # OpenAI "pcm" output: 24 kHz, 16-bit mono
+    # off by default: there is no echo reference, so on open speakers the mic hears the
+    # interviewer. Meant for headphones (main.py --barge_in).
+    barge_in: bool = False
+    barge_in_min_ms: int = 250
+    barge_in_ratio: float = 4.0  # speech must be this far above the floor/echo level
+    barge_in_calibrate_ms: int = 300  # playback heard before barge-in arms, to measure echo
+
+
+class AudioRingBuffer:
+    """Preallocated float32 ring buffer; writes never allocate, reads return one contiguous copy."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self._write = 0
+        self._filled = 0
+
+    def clear(self) -> None:
+        self._write = 0
+        self._filled = 0
+
+    def write(self, samples: "np.ndarray") -> None:
+        n = samples.shape[0]
+        if n >= self.capacity:
+            self._data[:] = samples[-self.capacity:]
+            self._write = 0
+            self._filled = self.capacity
+            return
+        first = min(n, self.capacity - self._write)
+        self._data[self._write:self._write + first] = samples[:first]
+        if first < n:
+            self._data[: n - first] = samples[first:]
+        self._write = (self._write + n) % self.capacity
+        self._filled = min(self.capacity, self._filled + n)
+
+    def __len__(self) -> int:
+        return self._filled
+
+    def read(self) -> "np.ndarray":
+        if self._filled < self.capacity:
+            return self._data[: self._filled].copy()
+        return np.concatenate((self._data[self._write:], self._data[: self._write]))
 
 
 class VoiceRecorder:
-    """Streams audio from the microphone and stops when silence is detected."""
+    """
+    Records into a preallocated ring buffer and stops when silence is detected.
+
+    VAD runs per callback block over 10 ms windows against an adaptive noise floor
+    (`silence_threshold` is the lower bound), and end-of-speech is signalled from
+    the audio callback instead of a polling loop.
+    """
+
+    VAD_WINDOW_MS = 10
+    NOISE_FLOOR_RATIO = 3.0
+    NOISE_FLOOR_ALPHA = 0.05
 
     def __init__(self, sample_rate: int, silence_threshold: float, silence_duration: float):
         self.sample_rate = sample_rate
         self.silence_threshold = silence_threshold
         self.silence_duration = silence_duration
-        self._frames = []
+        self._buffer: Optional[AudioRingBuffer] = None
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
-        self._last_sound_time = None
+        self._window = max(1, int(sample_rate * self.VAD_WINDOW_MS / 1000))
+        self._reset_vad()
+
+    def _reset_vad(self) -> None:
+        self._noise_floor = self.silence_threshold / self.NOISE_FLOOR_RATIO
         self._heard_sound = False
+        self._silent_samples = 0
+
+    def _speech_windows(self, samples: "np.ndarray") -> "np.ndarray":
+        """Boolean speech mask per window; also adapts the noise floor on quiet windows."""
+        n_windows = samples.shape[0] // self._window
+        if n_windows == 0:
+            return np.zeros(0, dtype=bool)
+        frames = samples[: n_windows * self._window].reshape(n_windows, self._window)
+        rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / self._window)
+        threshold = max(self.silence_threshold, self._noise_floor * self.NOISE_FLOOR_RATIO)
+        speech = rms > threshold
+        quiet = rms[~speech]
+        if quiet.size:
+            self._noise_floor += self.NOISE_FLOOR_ALPHA * (float(quiet.mean()) - self._noise_floor)
+        return speech
+
+    def _process_block(self, samples: "np.ndarray", max_samples: int) -> bool:
+        """Buffers a mono block and returns True once recording should stop."""
+        self._buffer.write(samples)
+        speech = self._speech_windows(samples)
+        if speech.any():
+            self._heard_sound = True
+            last_voiced = int(np.flatnonzero(speech)[-1])
+            self._silent_samples = samples.shape[0] - (last_voiced + 1) * self._window
+        else:
+            self._silent_samples += samples.shape[0]
+        if len(self._buffer) >= max_samples:
+            return True
+        return self._heard_sound and self._silent_samples >= self.silence_duration * self.sample_rate
+
+    def wait_for_barge_in(
+        self,
+        is_playing: Callable[[], bool],
+        *,
+        min_ms: int,
+        ratio: float,
+        calibrate_ms: int = 300,
+        playback_started: Callable[[], bool] = lambda: True,
+    ) -> Optional["np.ndarray"]:
+        """
+        Listens while the interviewer is speaking. Returns the captured pre-roll once the
+        candidate talks over playback for `min_ms`, or None if playback ends first.
+
+        The first `calibrate_ms` after `playback_started()` turns true (the first frame
+        reached the speaker, not the mic opening) only measure how loud playback is at the
+        mic (the echo level); barge-in then needs `ratio` times the louder of that and the
+        noise floor.
+        """
+        preroll = AudioRingBuffer(self.sample_rate)  # last second
+        needed = max(1, int(min_ms / self.VAD_WINDOW_MS))
+        calibration_windows = max(1, int(calibrate_ms / self.VAD_WINDOW_MS))
+        state = {"run": 0, "seen": 0, "echo": 0.0}
+        barged = threading.Event()
+        self._reset_vad()
+
+        def callback(indata, frames, time_info, status):  # pragma: no cover - called by sounddevice
+            if barged.is_set():
+                return
+            samples = indata[:, 0]
+            preroll.write(samples)
+            n_windows = samples.shape[0] // self._window
+            if n_windows == 0:
+                return
+            frames_ = samples[: n_windows * self._window].reshape(n_windows, self._window)
+            rms = np.sqrt(np.einsum("ij,ij->i", frames_, frames_) / self._window)
+            if state["seen"] < calibration_windows:
+                if not playback_started():
+                    return  # speech is still being synthesized; nothing to measure or talk over
+                calibrating = rms[: calibration_windows - state["seen"]]
+                state["echo"] = max(state["echo"], float(calibrating.max()))
+                state["seen"] += calibrating.size
+                rms = rms[calibrating.size:]
+                if not rms.size:
+                    return
+            threshold = max(self.silence_threshold, self._noise_floor, state["echo"]) * ratio
+            for loud in rms > threshold:
+                state["run"] = state["run"] + 1 if loud else 0
+                if state["run"] >= needed:
+                    barged.set()
+                    return
+            quiet = rms[rms <= threshold]
+            if quiet.size:
+                self._noise_floor += self.NOISE_FLOOR_ALPHA * (float(quiet.mean()) - self._noise_floor)
 
-    def record(self, max_seconds: int) -> "np.ndarray":
+        try:
+            with sd.InputStream(samplerate=self.sample_rate, channels=1, dtype="float32", callback=callback):
+                while is_playing() and not barged.wait(timeout=0.05):
+                    pass
+        except Exception as exc:
+            print(f"⚠️  Barge-in monitor failed: {exc}")
+            return None
+        if not barged.is_set():
+            return None
+        # keep the onset plus a little lead-in, not a full second of speaker echo
+        keep = int(self.sample_rate * (min_ms + 300) / 1000)
+        return preroll.read()[-keep:]
+
+    def record(
+        self,
+        max_seconds: int,
+        on_audio: Optional[Callable[["np.ndarray"], None]] = None,
+        preroll: Optional["np.ndarray"] = None,
+    ) -> "np.ndarray":
         if sd is None or np is None:
             raise RuntimeError("sounddevice is required for voice recording.")
-        self._frames = []
+        max_samples = int(max_seconds * self.sample_rate)
+        if self._buffer is None or self._buffer.capacity != max_samples:
+            self._buffer = AudioRingBuffer(max_samples)
+        self._buffer.clear()
         self._stop_event.clear()
-        self._heard_sound = False
-        self._last_sound_time = None
-        start_time = time.time()
+        self._reset_vad()
+        if preroll is not None and preroll.size:
+            # speech that triggered a barge-in: keep it and count it as heard
+            self._buffer.write(preroll)
+            self._heard_sound = True
+            if on_audio is not None:
+                on_audio(preroll.reshape(-1, 1))
 
         def callback(indata, frames, time_info, status):  # pragma: no cover - called by sounddevice
-            rms = float(np.sqrt(np.mean(indata**2)))
-            now = time.time()
+            if self._stop_event.is_set():
+                return
+            samples = indata[:, 0]
             with self._lock:
-                self._frames.append(indata.copy())
-                if rms > self.silence_threshold:
-                    self._heard_sound = True
-                    self._last_sound_time = now
+                done = self._process_block(samples, max_samples)
+            if on_audio is not None:
+                on_audio(indata.copy())
+            if done:
+                self._stop_event.set()
 
         try:
-            with sd.InputStream(samplerate=self.sample_rate, channels=1, callback=callback):
-                while not self._stop_event.is_set():
-                    now = time.time()
-                    if now - start_time >= max_seconds:
-                        break
-                    if self._heard_sound and self._last_sound_time and (now - self._last_sound_time) >= self.silence_duration:
-                        break
-                    time.sleep(0.1)
+            with sd.InputStream(samplerate=self.sample_rate, channels=1, dtype="float32", callback=callback):
+                # small grace period covers device start-up latency
+                self._stop_event.wait(timeout=max_seconds + 1.0)
         except Exception as exc:
             print(f"⚠️  Audio recording failed: {exc}")
             return np.array([], dtype="float32")
 
         with self._lock:
-            if not self._frames:
-                return np.array([], dtype="float32")
-            audio = np.concatenate(self._frames, axis=0).flatten()
-            self._frames = []
-        return audio
+            return self._buffer.read()
 
     def stop(self) -> None:
         self._stop_event.set()
 
 
+class StreamingTranscriber:
+    """
+    Transcribes speech segment by segment while the candidate is still talking.
+
+    `feed` is called from the audio callback and only enqueues. A background
+    uploader thread cuts a segment at the first pause after `min_segment_seconds`
+    (or at `max_segment_seconds`) and ships it for transcription. By end-of-speech
+    only the tail segment is still in flight.
+    """
+
+    def __init__(self, client: OpenAI, config: OpenAIVoiceConfig):
+        self.client = client
+        self.config = config
+        self.partials: List[str] = []
+        self._queue: "queue.Queue[Optional[np.ndarray]]" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stt-upload")
+        self._futures: List[Future] = []
+        self._thread = threading.Thread(target=self._run, name="stt-segmenter", daemon=True)
+        self._thread.start()
+
+    def feed(self, block: "np.ndarray") -> None:
+        self._queue.put(block)
+
+    def _run(self) -> None:
+        blocks: List["np.ndarray"] = []
+        samples = 0
+        min_samples = int(self.config.min_segment_seconds * self.config.sample_rate)
+        max_samples = int(self.config.max_segment_seconds * self.config.sample_rate)
+        while True:
+            block = self._queue.get()
+            if block is None:
+                break
+            blocks.append(block)
+            samples += block.shape[0]
+            paused = float(np.sqrt(np.mean(block**2))) <= self.config.silence_threshold
+            if samples >= max_samples or (samples >= min_samples and paused):
+                self._ship(blocks)
+                blocks, samples = [], 0
+        if blocks:
+            self._ship(blocks)
+
+    def _ship(self, blocks: List["np.ndarray"]) -> None:
+        segment = np.concatenate(blocks, axis=0).flatten()
+        self._futures.append(self._pool.submit(self._transcribe_segment, segment))
+
+    def _transcribe_segment(self, segment: "np.ndarray") -> str:
+        wav, _ = prepare_for_stt(segment, self.config.sample_rate, silence_threshold=self.config.silence_threshold)
+        if wav is None:
+            return ""
+        resp = self.client.audio.transcriptions.create(model=self.config.stt_model, file=wav)
+        text = getattr(resp, "text", "").strip()
+        if text:
+            self.partials.append(text)
+            print(f"(partial) {text}")
+        return text
+
+    def finish(self) -> str:
+        """Flush the tail segment and return the transcript in capture order."""
+        self._queue.put(None)
+        self._thread.join()
+        texts = []
+        for fut in self._futures:
+            try:
+                text = fut.result()
+            except Exception as exc:
+                print(f"⚠️  Segment transcription failed: {exc}")
+                continue
+            if text:
+                texts.append(text)
+        self._pool.shutdown(wait=False)
+        return " ".join(texts)
+
+
+class PrefetchedSpeech:
+    """Downloads one TTS utterance in the background; iterating yields chunks as they land."""
+
+    _DONE = object()
+
+    def __init__(self, pool: ThreadPoolExecutor, fetch: Callable[[], Iterator[bytes]]):
+        self._chunks: "queue.Queue[object]" = queue.Queue()
+        self._cancelled = threading.Event()
+        pool.submit(self._download, fetch)
+
+    def _download(self, fetch: Callable[[], Iterator[bytes]]) -> None:
+        try:
+            for chunk in fetch():
+                if self._cancelled.is_set():
+                    break
+                self._chunks.put(chunk)
+        except Exception as exc:
+            print(f"⚠️  Speech synthesis failed: {exc}")
+        finally:
+            self._chunks.put(self._DONE)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def __iter__(self) -> Iterator[bytes]:
+        while not self._cancelled.is_set():
+            chunk = self._chunks.get()
+            if chunk is self._DONE:
+                return
+            yield chunk
+
+
+class StreamingPlayer:
+    """Plays 16-bit PCM chunks from an iterator as they arrive, on a background thread."""
+
+    def __init__(self, chunks: Iterator[bytes], sample_rate: int):
+        self._chunks = chunks
+        self.sample_rate = sample_rate
+        self._stop = threading.Event()
+        self.started = threading.Event()  # set once the first frame is written
+        self._thread = threading.Thread(target=self._run, name="tts-playback", daemon=True)
+
+    def start(self) -> "StreamingPlayer":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        carry = b""
+        try:
+            with sd.RawOutputStream(samplerate=self.sample_rate, channels=1, dtype="int16") as out:
+                for chunk in self._chunks:
+                    if self._stop.is_set():
+                        out.abort()
+                        return
+                    data = carry + chunk
+                    usable = len(data) - (len(data) % 2)
+                    carry = data[usable:]
+                    if usable:
+                        out.write(data[:usable])
+                        self.started.set()
+        except Exception as exc:
+            print(f"⚠️  Audio playback failed: {exc}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def is_playing(self) -> bool:
+        return self._thread.is_alive()
+
+    def wait(self) -> None:
+        if self._thread.is_alive():
+            self._thread.join()
+
+
 class OpenAIVoiceInterface(VoiceInterface):
     """Voice interface powered by OpenAI speech APIs."""
 
@@ -104,88 +418,130 @@ class OpenAIVoiceInterface(VoiceInterface):
         self.client = client
         self.config = config or OpenAIVoiceConfig()
         self.recorder = VoiceRecorder(self.config.sample_rate, self.config.silence_threshold, self.config.silence_duration)
+        self._player: Optional[StreamingPlayer] = None
+        # speak() only enqueues: synthesis starts at once in the pool, playback runs in order
+        self._tts_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tts-fetch")
+        self._playlist: "queue.Queue[PrefetchedSpeech]" = queue.Queue()
+        # every utterance from speak() until its playback ends, including the one the
+        # playback thread has dequeued but not started yet; a barge-in cancels them all
+        self._pending: Set[PrefetchedSpeech] = set()
+        self._playback_lock = threading.Lock()
+        self._playback_thread = threading.Thread(target=self._playback_loop, name="tts-queue", daemon=True)
+        self._playback_thread.start()
 
     def speak(self, text: str) -> None:
+        """Queues an utterance and returns; the next listen() arms the mic during playback."""
         if not text:
             return
-        resp = self.client.audio.speech.create(
+        speech = PrefetchedSpeech(self._tts_pool, lambda: self._stream_tts(text))
+        with self._playback_lock:
+            self._pending.add(speech)
+        self._playlist.put(speech)
+
+    def _stream_tts(self, text: str) -> Iterator[bytes]:
+        with self.client.audio.speech.with_streaming_response.create(
             model=self.config.tts_model,
             voice=self.config.voice,
             input=text,
+            response_format="pcm",
+        ) as resp:
+            yield from resp.iter_bytes(4096)
+
+    def _playback_loop(self) -> None:
+        while True:
+            speech = self._playlist.get()
+            try:
+                with self._playback_lock:
+                    # checked under the lock _stop_playback cancels with, so a barge-in
+                    # between get() and start() still stops this utterance
+                    if speech.cancelled:
+                        continue
+                    player = self._player = StreamingPlayer(iter(speech), self.config.tts_sample_rate).start()
+                player.wait()
+            finally:
+                with self._playback_lock:
+                    self._pending.discard(speech)
+                    self._player = None
+                self._playlist.task_done()
+
+    def _is_speaking(self) -> bool:
+        return self._playlist.unfinished_tasks > 0
+
+    def _playback_started(self) -> bool:
+        player = self._player
+        return player is not None and player.started.is_set()
+
+    def _stop_playback(self) -> None:
+        with self._playback_lock:
+            for speech in self._pending:
+                speech.cancel()
+            while True:
+                try:
+                    speech = self._playlist.get_nowait()
+                except queue.Empty:
+                    break
+                self._pending.discard(speech)
+                self._playlist.task_done()
+            player = self._player
+        if player is not None:
+            player.stop()
+
+    def wait_until_done(self) -> None:
+        self._playlist.join()
+
+    def _await_turn(self) -> Optional["np.ndarray"]:
+        """While the interviewer is still talking, watch for barge-in; returns its pre-roll."""
+        if not self._is_speaking():
+            return None
+        if not self.config.barge_in:
+            self.wait_until_done()
+            return None
+        preroll = self.recorder.wait_for_barge_in(
+            self._is_speaking,
+            min_ms=self.config.barge_in_min_ms,
+            ratio=self.config.barge_in_ratio,
+            calibrate_ms=self.config.barge_in_calibrate_ms,
+            playback_started=self._playback_started,
         )
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp:
-            tmp.write(resp.read())
-            tmp_path = tmp.name
-        self._play_audio(tmp_path)
-        os.unlink(tmp_path)
+        if preroll is not None:
+            print("(barge-in: stopping playback)")
+            self._stop_playback()
+        self.wait_until_done()
+        return preroll
 
     def listen(self, prompt: str = "Speak now...") -> str:
         print(f"\n🎙️  {prompt}")
+        preroll = self._await_turn()
         retries = max(1, self.config.max_retries)
         for attempt in range(1, retries + 1):
             print(f"(Listening attempt {attempt}/{retries}, up to {self.config.max_seconds}s)")
-            audio = self.recorder.record(self.config.max_seconds)
+            streamer = StreamingTranscriber(self.client, self.config) if self.config.streaming_stt else None
+            audio = self.recorder.record(self.config.max_seconds, on_audio=streamer.feed if streamer else None, preroll=preroll)
+            preroll = None
             if audio.size == 0:
+                if streamer:
+                    streamer.finish()
                 print("⚠️  No audio captured. Retrying..." if attempt < retries else "⚠️  No audio captured.")
                 continue
-            text = self._transcribe_audio(audio)
+            text = streamer.finish() if streamer else self._transcribe_audio(audio)
             if text:
                 return text
             print("⚠️  Transcription empty. Retrying..." if attempt < retries else "⚠️  Transcription empty.")
         return ""
 
     def _transcribe_audio(self, audio: "np.ndarray") -> str:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            self._write_wav(tmp, audio)
-            tmp_path = tmp.name
-        try:
-            with open(tmp_path, "rb") as f:
-                resp = self.client.audio.transcriptions.create(
-                    model=self.config.stt_model,
-                    file=f,
-                )
-        finally:
-            os.unlink(tmp_path)
+        wav, samples = prepare_for_stt(audio, self.config.sample_rate, silence_threshold=self.config.silence_threshold)
+        if wav is None:
+            return ""
+        print(f"(Uploading {wav.getbuffer().nbytes} bytes, {samples / TARGET_SAMPLE_RATE:.1f}s of speech)")
+        resp = self.client.audio.transcriptions.create(
+            model=self.config.stt_model,
+            file=wav,
+        )
         return getattr(resp, "text", "").strip()
 
-    def _write_wav(self, tmp, audio):
-        import wave
-
-        audio_data = (audio * 32767).astype(np.int16)  # type: ignore
-        with wave.open(tmp, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(self.config.sample_rate)
-            wf.writeframes(audio_data.tobytes())
-
-    def _play_audio(self, path: str) -> None:
-        player = self._detect_player()
-        if player:
-            subprocess.run([player, path], check=False)
-            return
-        try:
-            import simpleaudio as sa  # type: ignore
-
-            wave_obj = sa.WaveObject.from_wave_file(path)
-            play_obj = wave_obj.play()
-            play_obj.wait_done()
-            return
-        except Exception:
-            pass
-        print("⚠️  Unable to auto-play audio. File saved at:", path)
-
-    def _detect_player(self) -> Optional[str]:
-        system = platform.system().lower()
-        if system == "darwin" and shutil.which("afplay"):
-            return "afplay"
-        if system == "linux" and shutil.which("aplay"):
-            return "aplay"
-        if shutil.which("ffplay"):
-            return "ffplay"
-        return None
-
 
-def create_voice_interface(client: OpenAI, *, max_seconds: int = 12) -> VoiceInterface:
+def create_voice_interface(client: OpenAI, *, max_seconds: int = 12, barge_in: bool = False) -> VoiceInterface:
     if client is None:
         raise RuntimeError("OpenAI client is required for voice mode.")
-    return OpenAIVoiceInterface(client, OpenAIVoiceConfig(max_seconds=max_seconds))
+    return OpenAIVoiceInterface(client, OpenAIVoiceConfig(max_seconds=max_seconds, barge_in=barge_in))
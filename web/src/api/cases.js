@@ -1,9 +1,12 @@
-export async function fetchCases(token, page = 0, limit = 10) {
+export async function fetchCases(token, cursor = null, limit = 10) {
     const headers = {};
     if (token) {
         headers.Authorization = `Bearer ${token}`;
     }
-    const resp = await fetch(`/api/cases?page=${page}&limit=${limit}`, { headers });
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor)
+        params.set('cursor', cursor);
+    const resp = await fetch(`/api/cases?${params}`, { headers });
     if (!resp.ok) {
         throw new Error('Unable to load cases');
     }
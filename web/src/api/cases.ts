@@ -19,16 +19,18 @@ export interface CaseSummary {
   }[];
 }
 
-export async function fetchCases(token: string | null, page = 0, limit = 10) {
+export async function fetchCases(token: string | null, cursor: string | null = null, limit = 10) {
   const headers: Record<string, string> = {};
   if (token) {
     headers.Authorization = `Bearer ${token}`;
   }
-  const resp = await fetch(`/api/cases?page=${page}&limit=${limit}`, { headers });
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) params.set('cursor', cursor);
+  const resp = await fetch(`/api/cases?${params}`, { headers });
   if (!resp.ok) {
     throw new Error('Unable to load cases');
   }
-  return resp.json() as Promise<{ cases: CaseSummary[]; hasMore: boolean }>;
+  return resp.json() as Promise<{ cases: CaseSummary[]; hasMore: boolean; nextCursor: string | null }>;
 }
 
 export async function fetchCaseReport(token: string | null, caseId: string) {
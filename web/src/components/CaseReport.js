@@ -31,5 +31,5 @@ export default function CaseReport({ caseId }) {
         return _jsx("p", { children: error });
     if (!report)
         return _jsx("p", { children: "Loading\u2026" });
-    return (_jsxs("div", { children: [_jsx("h2", { children: report.case.title }), _jsx("p", { children: report.overall.executiveSummary }), _jsx("ul", { children: report.rubrics.map((rubric) => (_jsxs("li", { children: [rubric.title, ": ", rubric.score, " / 5"] }, rubric.key))) })] }));
+    return (_jsxs("div", { children: [_jsx("h2", { children: report.case.title }), _jsx("p", { children: report.overall.executiveSummary }), _jsx("ul", { children: report.rubrics.map((rubric) => (_jsxs("li", { children: [rubric.title, ": ", rubric.score, " / 5", rubric.percentile != null && ` (ahead of ${Math.round(rubric.percentile)}% of candidates)`] }, rubric.key))) })] }));
 }
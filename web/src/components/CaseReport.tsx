@@ -41,6 +41,7 @@ export default function CaseReport({ caseId }: { caseId: string }) {
         {report.rubrics.map((rubric) => (
           <li key={rubric.key}>
             {rubric.title}: {rubric.score} / 5
+            {rubric.percentile != null && ` (ahead of ${Math.round(rubric.percentile)}% of candidates)`}
           </li>
         ))}
       </ul>
@@ -21,7 +21,7 @@ export default function Dashboard() {
     const [cases, setCases] = useState([]);
     const [loading, setLoading] = useState(true);
     const [loadingMore, setLoadingMore] = useState(false);
-    const [page, setPage] = useState(0);
+    const [cursor, setCursor] = useState(null);
     const [hasMore, setHasMore] = useState(true);
     const [error, setError] = useState(null);
     const [activeTab, setActiveTab] = useState('progress');
@@ -36,10 +36,10 @@ export default function Dashboard() {
             setLoading(true);
             try {
                 const token = await getAccessToken();
-                const data = await fetchCases(token, 0);
+                const data = await fetchCases(token);
                 setCases(data.cases);
                 setHasMore(data.hasMore);
-                setPage(0);
+                setCursor(data.nextCursor);
                 setError(null);
             }
             catch (err) {
@@ -58,11 +58,10 @@ export default function Dashboard() {
         setLoadingMore(true);
         try {
             const token = await getAccessToken();
-            const nextPage = page + 1;
-            const data = await fetchCases(token, nextPage);
+            const data = await fetchCases(token, cursor);
             setCases((prev) => [...prev, ...data.cases]);
             setHasMore(data.hasMore);
-            setPage(nextPage);
+            setCursor(data.nextCursor);
             setError(null);
         }
         catch (err) {
@@ -6,6 +6,8 @@ export interface RubricItem {
   key: string;
   title: string;
   score: number;
+  percentile?: number;
+  cohortSize?: number;
   strengths: RubricEvidence[];
   improvements: RubricEvidence[];
 }
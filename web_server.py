@@ -1,12 +1,14 @@
+import atexit
+import contextlib
 import os
 import base64
-import tempfile
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 
-from flask import Flask, jsonify, request, send_from_directory
-from supabase_client import supabase
-from persistence import save_case_report, list_cases, get_case_report
-from openai import OpenAI
+from flask import Flask, Response, jsonify, request, send_from_directory
+from supabase_client import get_supabase
+from auth_tokens import TokenRejected, TokenVerifier
+from http_cache import conditional, conditional_json, register_compression
+from persistence import save_case_report, list_cases, get_case_report, get_progress, load_score_sketches
 
 try:
     from dotenv import load_dotenv
@@ -16,46 +18,129 @@ except Exception:
     pass
 
 from case_store import CaseStore
-from controller import Session, InterviewController
-from llm_client import LLMClient
+from chart_renderer import HeadlessChartRenderer, IMAGE_MIME_TYPES
+from stt_stream import ChunkedTranscriptionStore, upload_from_bytes
+from controller import Session, InterviewController, scoring_inputs
+from cohort_benchmarks import CohortBenchmarks
+from event_log import EventLog
+from replay import TranscriptRecorder
+from session_snapshot import read_snapshot, restore, snapshot_ib_session, snapshot_session, write_snapshot
+from llm_client import LLMClient, LLMCallPolicy, lazy_openai_client
 from case_generator import generate_case, CONSULTING_CASE_TYPES
-from ib_session import (
-    IBInterviewSession,
-    PRODUCT_GUIDES,
-    SECTOR_GUIDES,
-    DEFAULT_ACCOUNTING,
-    DEFAULT_VALUATION,
-)
+
+if TYPE_CHECKING:
+    from ib_session import IBInterviewSession
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 WEB_APP_DIST = os.path.join(BASE_DIR, "web", "dist")
 
 app = Flask(__name__, static_folder="frontend", static_url_path="")
-
-client = OpenAI()
-llm = LLMClient(client=client, model=os.getenv("MODEL", "gpt-4.1"))
-case_store = CaseStore()
+register_compression(app)
+
+# built on first request so worker boot doesn't pay for the openai import
+client = lazy_openai_client()
+llm = LLMClient(
+    client=client,
+    model=os.getenv("MODEL", "gpt-4.1"),
+    fallback_model=os.getenv("FALLBACK_MODEL"),
+    policy=LLMCallPolicy.from_env(),
+)
+case_store = CaseStore.from_env()
+chart_images = HeadlessChartRenderer()
+token_verifier = TokenVerifier.from_env(lambda token: get_supabase().auth.get_user(token))
 DEFAULT_CASE_TYPE = "Profitability"
+# per-rubric cohort percentiles for new reports, from the score_sketches table
+benchmarks = CohortBenchmarks.from_env(load_score_sketches)
 
 
 def controller_case_generator(**params):
     requested_case_type = params.get("case_type") or DEFAULT_CASE_TYPE
-    return generate_case(llm, case_type=requested_case_type)
+    case_obj = generate_case(llm, case_type=requested_case_type)
+    chart_images.prerender(case_obj)
+    return case_obj
 
 
 controller = InterviewController(
     case_store=case_store,
     llm_client=llm,
     case_generator_fn=controller_case_generator,
+    benchmarks=benchmarks,
 )
 session = Session(case_id="web_session_case")
-ib_session: Optional[IBInterviewSession] = None
+ib_session: Optional["IBInterviewSession"] = None
 ib_report: Optional[Dict[str, Any]] = None
 
+# REPLAY_RECORD_DIR records utterances + raw LLM outputs for offline replay (replay.py)
+recorder = TranscriptRecorder.from_env()
+if recorder is not None:
+    recorder.attach(llm)
+    recorder.attach_eval_cache(controller.eval_cache)
+
+
+def recording_turn(flow: str, student: Optional[str] = None):
+    if recorder is None:
+        return contextlib.nullcontext({})
+    return recorder.turn(flow, student)
+
+
+# EVENT_LOG_DIR enables the append-only transcript log
+event_log = EventLog.from_env()
+if event_log is not None:
+    atexit.register(event_log.close)
 
-def serialize_events(events: List[Any]) -> List[Dict[str, Any]]:
+# When set, live sessions are snapshotted after every turn and restored on boot,
+# so a restart or rolling deploy doesn't drop a candidate mid-interview.
+SNAPSHOT_DIR = os.getenv("SESSION_SNAPSHOT_DIR")
+
+
+def _snapshot_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.snapshot")
+
+
+def persist_sessions() -> None:
+    # cheap on the request path: only enqueues new events for the background flusher
+    if event_log is not None:
+        event_log.sync(f"consulting-{session.session_id}", session.events)
+        if ib_session is not None:
+            event_log.sync(f"ib-{ib_session.session_id}", ib_session.events)
+    if not SNAPSHOT_DIR:
+        return
+    try:
+        write_snapshot(_snapshot_path("consulting"), snapshot_session(session, case_store))
+        if ib_session is not None:
+            write_snapshot(_snapshot_path("ib"), snapshot_ib_session(ib_session))
+    except Exception as exc:
+        print(f"⚠️  Session snapshot failed: {exc}")
+
+
+def restore_sessions() -> None:
+    global session, ib_session, ib_report
+    if not SNAPSHOT_DIR:
+        return
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    for name in ("consulting", "ib"):
+        blob = read_snapshot(_snapshot_path(name))
+        if blob is None:
+            continue
+        try:
+            restored = restore(blob, llm_client=llm, case_store=case_store, benchmarks=benchmarks)
+        except Exception as exc:
+            print(f"⚠️  Ignoring unreadable {name} snapshot: {exc}")
+            continue
+        if name == "consulting":
+            session = restored
+        else:
+            ib_session = restored
+            ib_report = restored.get_report()
+
+
+restore_sessions()
+
+
+def serialize_events(events: List[Any], start: int = 0) -> List[Dict[str, Any]]:
     return [
         {
+            "seq": start + offset + 1,
             "role": e.role,
             "stage_id": e.stage_id,
             "text": e.text,
@@ -63,17 +148,36 @@ def serialize_events(events: List[Any]) -> List[Dict[str, Any]]:
             "action": e.meta.get("action"),
             "chart_spec": e.meta.get("chart_spec"),
         }
-        for e in events
+        for offset, e in enumerate(events[start:])
     ]
 
 
+def _parse_since(raw: Any) -> Optional[int]:
+    try:
+        return int(raw) if raw is not None and raw != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def event_delta(total: int, since: Optional[int], serialize) -> Dict[str, Any]:
+    """
+    Events are append-only and numbered 1..n, so a client that has seen up to `since`
+    only needs the tail. No cursor (or one from an older session) gets the full list.
+    """
+    reset = since is None or since < 0 or since > total
+    start = 0 if reset else since
+    return {"events": serialize(start), "cursor": total, "reset": reset}
+
+
 def serialize_turn(turn: Dict[str, Any]) -> Dict[str, Any]:
     if not turn:
         return {}
+    chart_spec = turn.get("chart_spec")
     return {
         "next_action": turn.get("next_action"),
         "next_utterance": turn.get("next_utterance"),
-        "chart_spec": turn.get("chart_spec"),
+        "chart_spec": chart_spec,
+        "chart_image": f"/api/chart/{chart_images.register(chart_spec)}" if chart_spec else None,
         "stage_id": turn.get("stage_id"),
     }
 
@@ -103,6 +207,7 @@ def _react_app_available() -> bool:
 
 
 def _require_supabase_user():
+    supabase = get_supabase()
     if supabase is None:
         return None, jsonify({"error": "Supabase not configured"}), 500
     auth_header = request.headers.get("Authorization", "")
@@ -110,13 +215,10 @@ def _require_supabase_user():
         return None, jsonify({"error": "missing bearer token"}), 401
     access_token = auth_header.split(" ", 1)[1]
     try:
-        user_resp = supabase.auth.get_user(access_token)
-    except Exception as exc:
+        user = token_verifier.verify(access_token)
+    except TokenRejected as exc:
         app.logger.warning("Supabase auth failed: %s", exc)
         return None, jsonify({"error": "invalid token"}), 401
-    user = getattr(user_resp, "user", None)
-    if not user:
-        return None, jsonify({"error": "invalid token"}), 401
     return user, None, None
 
 
@@ -158,16 +260,20 @@ def api_start():
     if case_type and case_type not in CONSULTING_CASE_TYPES:
         return jsonify({"error": "invalid case_type"}), 400
     chosen_case_type = case_type if case_type in CONSULTING_CASE_TYPES else DEFAULT_CASE_TYPE
+    if event_log is not None:
+        event_log.release(f"consulting-{session.session_id}")
     session = Session(case_id="web_session_case")
     session.case_params["case_type"] = chosen_case_type
     session.selected_firm = firm
-    out = controller.start(session)
-    return jsonify(
-        {
-            "events": serialize_events(session.events),
-            "turns": take_turns(out),
-        }
-    )
+    if recorder is not None:
+        recorder.begin("consulting", session.session_id, {"case_type": chosen_case_type, "firm": firm})
+    with recording_turn("consulting") as record:
+        out = controller.start(session)
+        turns = take_turns(out)
+        record["interviewer"] = [t.get("next_utterance") for t in turns]
+    persist_sessions()
+    delta = event_delta(len(session.events), None, lambda start: serialize_events(session.events, start))
+    return jsonify({**delta, "turns": turns})
 
 
 @app.route("/api/respond", methods=["POST"])
@@ -176,27 +282,53 @@ def api_respond():
     text = data.get("text", "").strip()
     if not text:
         return jsonify({"error": "text required"}), 400
-    turn = controller.step(session, text)
-    return jsonify({"events": serialize_events(session.events), "turns": take_turns(turn)})
+    since = _parse_since(data.get("since"))
+    with recording_turn("consulting", text) as record:
+        turn = controller.step(session, text)
+        turns = take_turns(turn)
+        record["interviewer"] = [t.get("next_utterance") for t in turns]
+    persist_sessions()
+    delta = event_delta(len(session.events), since, lambda start: serialize_events(session.events, start))
+    return jsonify({**delta, "turns": turns})
 
 
 @app.route("/api/state", methods=["GET"])
 def api_state():
-    return jsonify({"events": serialize_events(session.events)})
+    since = _parse_since(request.args.get("since"))
+    return jsonify(event_delta(len(session.events), since, lambda start: serialize_events(session.events, start)))
+
+
+@app.route("/api/metrics", methods=["GET"])
+def api_metrics():
+    return jsonify({"eval": controller.eval_cache.summary(), "auth": token_verifier.summary(), "case_store": case_store.summary(), "event_log": event_log.stats if event_log else None, "benchmarks": benchmarks.summary()})
+
+
+@app.route("/api/chart/<spec_hash>", methods=["GET"])
+def api_chart(spec_hash: str):
+    fmt = request.args.get("format", "png")
+    if fmt not in IMAGE_MIME_TYPES:
+        return jsonify({"error": "format must be png or svg"}), 400
+    image = chart_images.get(spec_hash, fmt)
+    if image is None:
+        return jsonify({"error": "chart not found"}), 404
+    resp = Response(image, mimetype=IMAGE_MIME_TYPES[fmt])
+    # the URL is content-addressed, so the image can never change
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return conditional(resp, f"{spec_hash}-{fmt}")
 
 
 @app.route("/api/report", methods=["GET"])
 def api_report():
     if not session.case_report:
         return jsonify({"error": "report not ready"}), 404
-    return jsonify(session.case_report)
+    return conditional_json(session.case_report)
 
 
 @app.route("/api/ib/report", methods=["GET"])
 def api_ib_report():
     if not ib_report:
         return jsonify({"error": "report not ready"}), 404
-    return jsonify(ib_report)
+    return conditional_json(ib_report)
 
 
 @app.route("/api/cases/save", methods=["POST"])
@@ -209,8 +341,12 @@ def api_save_case():
     report = data.get("report")
     if not report:
         return jsonify({"error": "report required"}), 400
+    # the live session's evaluations travel with its report so regenerate_reports.py can rescore it
+    inputs = None
+    if session.case_report and report.get("case") == session.case_report.get("case"):
+        inputs = scoring_inputs(session)
     try:
-        case_id = save_case_report(user.id, report)
+        case_id = save_case_report(user.id, report, scoring_inputs=inputs)
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
     return jsonify({"caseId": case_id})
@@ -228,7 +364,7 @@ def api_case_detail(case_id: str):
         return jsonify({"error": "not found"}), 404
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
-    return jsonify({"report": report})
+    return conditional_json({"report": report})
 
 
 @app.route("/api/cases", methods=["GET"])
@@ -237,14 +373,28 @@ def api_cases_list():
     if err_resp:
         return err_resp, status
 
-    limit = int(request.args.get("limit", 10))
-    page = int(request.args.get("page", 0))
-    offset = page * limit
+    limit = max(1, min(int(request.args.get("limit", 10)), 50))
+    cursor = request.args.get("cursor") or None
     try:
-        data, has_more = list_cases(user.id, limit=limit, offset=offset)
+        data, next_cursor = list_cases(user.id, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
-    return jsonify({"cases": data, "hasMore": has_more})
+    return jsonify({"cases": data, "hasMore": next_cursor is not None, "nextCursor": next_cursor})
+
+
+@app.route("/api/progress", methods=["GET"])
+def api_progress():
+    user, err_resp, status = _require_supabase_user()
+    if err_resp:
+        return err_resp, status
+
+    try:
+        progress = get_progress(user.id)
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+    return jsonify({"progress": progress})
 
 
 @app.route("/api/tts", methods=["POST"])
@@ -264,33 +414,73 @@ def api_tts():
     return jsonify({"audio_base64": audio_b64, "mime": "audio/mpeg"})
 
 
+def _transcribe_bytes(data: bytes, filename: str, mimetype: Optional[str]) -> str:
+    resp = client.audio.transcriptions.create(
+        model=os.getenv("STT_MODEL", "gpt-4o-mini-transcribe"),
+        file=upload_from_bytes(data, filename, mimetype),
+    )
+    return getattr(resp, "text", "").strip()
+
+
+stt_streams = ChunkedTranscriptionStore(_transcribe_bytes)
+
+
 @app.route("/api/transcribe", methods=["POST"])
 def api_transcribe():
     audio = request.files.get("audio")
     if not audio:
         return jsonify({"error": "audio file required"}), 400
-    tmp_path = None
     try:
-        with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as tmp:
-            audio.save(tmp)
-            tmp_path = tmp.name
-        with open(tmp_path, "rb") as f:
-            resp = client.audio.transcriptions.create(
-                model=os.getenv("STT_MODEL", "gpt-4o-mini-transcribe"),
-                file=f,
-            )
+        text = _transcribe_bytes(audio.read(), audio.filename or "response.webm", audio.mimetype)
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-    text = getattr(resp, "text", "").strip()
     return jsonify({"text": text})
 
 
+@app.route("/api/transcribe/chunk", methods=["POST"])
+def api_transcribe_chunk():
+    """
+    Streaming STT: the browser uploads self-contained segments while recording
+    (`stream_id`, `seq`, `audio`), then posts `final=1` with the segment count.
+    """
+    stream_id = request.form.get("stream_id", "")
+    if not stream_id:
+        return jsonify({"error": "stream_id required"}), 400
+    if request.form.get("final") == "1":
+        try:
+            text = stt_streams.finalize(stream_id, int(request.form.get("count", 0)))
+        except (KeyError, ValueError) as exc:
+            return jsonify({"error": str(exc)}), 400
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+        return jsonify({"text": text})
+
+    audio = request.files.get("audio")
+    if not audio:
+        return jsonify({"error": "audio file required"}), 400
+    try:
+        seq = int(request.form.get("seq", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seq must be an integer"}), 400
+    if seq < 0:
+        return jsonify({"error": "seq must be non-negative"}), 400
+    partial = stt_streams.add_segment(
+        stream_id, seq, audio.read(), audio.filename or f"segment_{seq}.webm", audio.mimetype
+    )
+    return jsonify({"partial": partial})
+
+
 @app.route("/api/ib/start", methods=["POST"])
 def api_ib_start():
     global ib_report
+    from ib_session import (
+        IBInterviewSession,
+        PRODUCT_GUIDES,
+        SECTOR_GUIDES,
+        DEFAULT_ACCOUNTING,
+        DEFAULT_VALUATION,
+    )
+
     data = request.get_json(force=True) or {}
     product = data.get("product_group")
     industry = data.get("industry_group")
@@ -306,17 +496,36 @@ def api_ib_start():
             industry_group=industry,
             accounting_guide=accounting_guide,
             valuation_guide=valuation_guide,
+            benchmarks=benchmarks,
         )
     except Exception as exc:
         return jsonify({"error": str(exc)}), 400
 
-    question = session_obj.start()
+    if recorder is not None:
+        recorder.attach_ib(session_obj)
+        recorder.begin(
+            "ib",
+            session_obj.session_id,
+            {
+                "product_group": product,
+                "industry_group": industry,
+                "accounting_guide": accounting_guide,
+                "valuation_guide": valuation_guide,
+            },
+        )
+    with recording_turn("ib") as record:
+        question = session_obj.start()
+        record["interviewer"] = [question]
     global ib_session
+    if event_log is not None and ib_session is not None:
+        event_log.release(f"ib-{ib_session.session_id}")
     ib_session = session_obj
     ib_report = None
+    persist_sessions()
+    delta = event_delta(len(session_obj.events), None, session_obj.serialize_events)
     return jsonify(
         {
-            "events": session_obj.serialize_events(),
+            **delta,
             "turns": [{"next_utterance": question, "stage_id": session_obj.current_stage_state["stage"].id}],
             "done": False,
         }
@@ -332,8 +541,11 @@ def api_ib_respond():
     text = data.get("text", "").strip()
     if not text:
         return jsonify({"error": "text required"}), 400
+    since = _parse_since(data.get("since"))
     try:
-        reply, done = ib_session.step(text)
+        with recording_turn("ib", text) as record:
+            reply, done = ib_session.step(text)
+            record["interviewer"] = [reply]
     except Exception as exc:
         return jsonify({"error": str(exc)}), 400
     stage_id = "summary"
@@ -341,9 +553,11 @@ def api_ib_respond():
         stage_id = ib_session.current_stage_state["stage"].id
     if done:
         ib_report = ib_session.get_report()
+    persist_sessions()
+    delta = event_delta(len(ib_session.events), since, ib_session.serialize_events)
     return jsonify(
         {
-            "events": ib_session.serialize_events(),
+            **delta,
             "turns": [{"next_utterance": reply, "stage_id": stage_id}],
             "done": done,
         }